@@ -0,0 +1,343 @@
+"""
+ASGI serving mode for the MutualChain AI Backend
+Answers I/O-only endpoints on the event loop and sends CPU-heavy model
+calls to a process pool of warm model workers.
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Configuration (environment variables):
+    INFERENCE_POOL_WORKERS       model worker processes (default: CPU count)
+    INFERENCE_POOL_MAX_PENDING   in-flight model calls before shedding load (default: 8 per worker)
+    INFERENCE_TIMEOUT_SECONDS    per-request model timeout (default: 30)
+    INFERENCE_POOL_START_METHOD  "spawn" (default): each worker loads its own models;
+                                 "forkserver": models are loaded once (worker_preload)
+                                 and workers share the weights copy-on-write
+    PRELOAD_MODELS               models each worker warms up (see model_registry)
+
+Each worker runs one call at a time, so its claim-text micro-batcher never
+sees concurrent items: workers run it with CLAIM_BATCH_MAX_WAIT_MS=0 instead
+of waiting for items that cannot arrive. Batching across requests happens in
+Flask mode, where handler threads share one model.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+
+# Models are loaded by the pool workers; the event loop process never loads them:
+# every route that uses a model is sent to the pool below, not to the Flask mount
+os.environ['MODEL_WARMUP'] = 'off'
+# Inherited by the workers (see module docstring)
+os.environ['CLAIM_BATCH_MAX_WAIT_MS'] = '0'
+import app as backend
+from metrics import metrics
+
+class PoolOverloaded(Exception):
+    """Raised when the inference pool queue is full"""
+
+
+class PoolRestarting(Exception):
+    """Raised while the pool is rebuilt after a worker died"""
+
+
+# Runs inside each worker process
+def _init_worker(model_names):
+    """Load the configured models once, before the worker takes requests"""
+    backend.registry.preload(model_names)
+
+def _call_handler(handler_name, payload):
+    """
+    Run a backend handler. Returns (result, error, report): the report carries
+    this worker's pid, inference stats and the model stages timed during the
+    call, which are returned even when the handler raised.
+    """
+    with metrics.capture_stages() as stages:
+        try:
+            result, error = getattr(backend, handler_name)(payload), None
+        except Exception as e:
+            result, error = None, e
+    report = {"pid": os.getpid(), "inference": backend.inference_stats_response(), "stages": stages}
+    return result, error, report
+
+def _worker_status():
+    return backend.registry.status()
+
+
+class InferencePool:
+    """Process pool of warm model workers with timeouts and load shedding"""
+
+    def __init__(self, workers=None, max_pending=None, timeout=None, model_names=None, start_method=None):
+        self.workers = workers or int(os.environ.get('INFERENCE_POOL_WORKERS', os.cpu_count() or 1))
+        self.max_pending = max_pending or int(
+            os.environ.get('INFERENCE_POOL_MAX_PENDING', self.workers * 8)
+        )
+        self.timeout = timeout or float(os.environ.get('INFERENCE_TIMEOUT_SECONDS', 30))
+        self.model_names = backend.served_models if model_names is None else model_names
+        self.start_method = start_method or os.environ.get('INFERENCE_POOL_START_METHOD', 'spawn')
+        if self.start_method not in ('spawn', 'forkserver'):
+            raise ValueError(f"Unsupported INFERENCE_POOL_START_METHOD: {self.start_method}")
+
+        self.executor = None
+        self.pending = 0
+        self.completed = 0
+        self.shed = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.warm = False
+        # Set while a replacement executor warms up after a worker died
+        self.restarting = False
+        self._warm_up_task = None
+        # pid -> latest batcher and cache statistics reported by that worker
+        self.worker_stats = {}
+
+    def start(self):
+        # Workers never inherit the event loop's threads: they are spawned fresh, or
+        # forked from a forkserver that has only loaded the models
+        context = multiprocessing.get_context(self.start_method)
+        if self.start_method == 'forkserver':
+            context.set_forkserver_preload(['worker_preload'])
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.model_names,)
+        )
+
+    async def warm_up(self):
+        """Start every worker and wait for their models to load"""
+        executor = self.executor
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(*[
+                loop.run_in_executor(executor, _worker_status)
+                for _ in range(self.workers)
+            ])
+        except BrokenProcessPool:
+            self._restart(executor)
+            return
+        self.warm = True
+        self.restarting = False
+
+    def begin_warm_up(self):
+        """Warm the workers up in the background; /ready reports when they are done"""
+        self._warm_up_task = asyncio.get_running_loop().create_task(self.warm_up())
+
+    def _restart(self, broken_executor):
+        """Replace an executor that lost a worker; later calls on the old one are no-ops"""
+        if self.executor is not broken_executor:
+            return
+        print("Inference pool worker died; restarting the pool")
+        self.warm = False
+        self.restarting = True
+        self.restarts += 1
+        broken_executor.shutdown(wait=False, cancel_futures=True)
+        self.start()
+        self.begin_warm_up()
+
+    def shutdown(self):
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def inference_stats(self):
+        """Batcher and cache statistics of every worker, as of its last completed call"""
+        return {str(pid): stats for pid, stats in sorted(self.worker_stats.items())}
+
+    async def run(self, handler_name, payload):
+        """Run a backend handler in a worker process"""
+        if self.restarting:
+            raise PoolRestarting()
+        if self.pending >= self.max_pending:
+            self.shed += 1
+            raise PoolOverloaded()
+
+        self.pending += 1
+        executor = self.executor
+        try:
+            loop = asyncio.get_running_loop()
+            try:
+                future = loop.run_in_executor(executor, _call_handler, handler_name, payload)
+                result, error, report = await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                # The worker finishes the call in the background; the caller stops waiting
+                self.timeouts += 1
+                raise
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed): every call on this executor fails from now on
+                self._restart(executor)
+                raise PoolRestarting()
+            self.worker_stats[report['pid']] = report['inference']
+            # Stage histograms are served by this process's /metrics
+            metrics.merge_stages(report['stages'])
+            if error is not None:
+                raise error
+            self.completed += 1
+            return result
+        finally:
+            self.pending -= 1
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "start_method": self.start_method,
+            "warm": self.warm,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "timeout_seconds": self.timeout,
+            "completed": self.completed,
+            "shed": self.shed,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+            "restarting": self.restarting
+        }
+
+
+pool = InferencePool()
+
+async def _run_in_pool(handler_name, payload, render=JSONResponse):
+    """Run a handler in the pool, mapping overload and timeouts to HTTP errors"""
+    try:
+        result = await pool.run(handler_name, payload)
+    except PoolOverloaded:
+        return JSONResponse(
+            {"error": "Inference queue full, retry later"}, status_code=503,
+            headers={"Retry-After": "1"}
+        )
+    except PoolRestarting:
+        return JSONResponse(
+            {"error": "Inference workers are restarting, retry later"}, status_code=503,
+            headers={"Retry-After": "5"}
+        )
+    except asyncio.TimeoutError:
+        return JSONResponse({"error": "Inference timed out"}, status_code=504)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+    with metrics.time_stage('serialize_json'):
+        return render(result)
+
+async def _json_body(request):
+    """Parsed JSON object body, or None when the body is not a JSON object"""
+    try:
+        data = await request.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+def _invalid_body():
+    return JSONResponse({"error": "Expected a JSON object body"}, status_code=400)
+
+
+# I/O-only endpoints, answered on the event loop
+async def health_check(request):
+    return JSONResponse({"status": "healthy", "service": "MutualChain AI Backend"})
+
+async def readiness_check(request):
+    """Ready once every pool worker has loaded its models"""
+    return JSONResponse(
+        {"ready": pool.warm, "served_models": pool.model_names, "pool": pool.stats()},
+        status_code=200 if pool.warm else 503
+    )
+
+async def check_parametric_trigger(request):
+    data = await _json_body(request)
+    if data is None:
+        return _invalid_body()
+    try:
+        return JSONResponse(backend.parametric_trigger_response(data))
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def pool_stats(request):
+    return JSONResponse(pool.stats())
+
+async def inference_stats(request):
+    """Micro-batching and result cache statistics, per pool worker"""
+    return JSONResponse({"workers": pool.inference_stats(), "pool": pool.stats()})
+
+
+# CPU-heavy endpoints, sent to the process pool
+async def assess_risk(request):
+    data = await _json_body(request)
+    if data is None:
+        return _invalid_body()
+    return await _run_in_pool(
+        'assess_risk_batch', [data], render=lambda results: JSONResponse(results[0])
+    )
+
+async def assess_risk_bulk(request):
+    mimetype = request.headers.get('content-type', '').split(';')[0].strip()
+    try:
+        records = backend.parse_batch_records(await request.body(), mimetype)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    def render(results):
+        if mimetype in backend.NDJSON_MIMETYPES:
+            body = ''.join(json.dumps(r) + '\n' for r in results)
+            return Response(body, media_type='application/x-ndjson')
+        return JSONResponse({"results": results, "count": len(results)})
+
+    if not records:
+        return render([])
+    return await _run_in_pool('assess_risk_batch', records, render=render)
+
+async def detect_fraud(request):
+    data = await _json_body(request)
+    if data is None:
+        return _invalid_body()
+    return await _run_in_pool('fraud_detection_response', data)
+
+async def detect_fraud_bulk(request):
+    data = await _json_body(request)
+    if not backend.is_columnar_claims(data):
+        return JSONResponse({"error": "Expected columnar claims with an 'amount' list"}, status_code=400)
+    return await _run_in_pool('fraud_detection_batch_response', data)
+
+async def verify_claim(request):
+    data = await _json_body(request)
+    if data is None:
+        return _invalid_body()
+    return await _run_in_pool('claim_verification_response', data)
+
+
+@asynccontextmanager
+async def lifespan(asgi_app):
+    pool.start()
+    pool.begin_warm_up()
+    try:
+        yield
+    finally:
+        pool.shutdown()
+
+
+# Requests to the routes above are recorded here; Flask records the mounted ones
+app = metrics.wrap_asgi(Starlette(
+    routes=[
+        Route('/health', health_check, methods=['GET']),
+        Route('/ready', readiness_check, methods=['GET']),
+        Route('/api/parametric-trigger', check_parametric_trigger, methods=['POST']),
+        Route('/api/inference/pool', pool_stats, methods=['GET']),
+        Route('/api/inference/stats', inference_stats, methods=['GET']),
+        Route('/api/risk-assessment', assess_risk, methods=['POST']),
+        Route('/api/risk-assessment/batch', assess_risk_bulk, methods=['POST']),
+        Route('/api/fraud-detection', detect_fraud, methods=['POST']),
+        Route('/api/fraud-detection/batch', detect_fraud_bulk, methods=['POST']),
+        Route('/api/claim-verification', verify_claim, methods=['POST']),
+        # Everything else is served by the Flask app; none of those routes use a model
+        Mount('/', app=WSGIMiddleware(backend.app))
+    ],
+    lifespan=lifespan
+))
@@ -0,0 +1,70 @@
+"""
+Benchmark: compiled Random Forest vs sklearn predict_proba
+
+Usage:
+    python benchmarks/bench_compiled_forest.py --rows 20000 --features 12
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_models.compiled_forest import CompiledForest
+
+def median_latency(fn, X, repeats):
+    times = []
+    for i in range(repeats):
+        row = X[i % len(X):i % len(X) + 1]
+        start = time.perf_counter()
+        fn(row)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+def throughput(fn, X):
+    start = time.perf_counter()
+    fn(X)
+    return len(X) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--features', type=int, default=12)
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--repeats', type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((args.rows, args.features))
+    y = (X[:, 0] + 0.5 * X[:, 1] ** 2 + rng.standard_normal(args.rows) * 0.3 > 0.5).astype(int)
+
+    # Same configuration as CreditScoringEnsemble.random_forest
+    forest = RandomForestClassifier(n_estimators=args.trees, random_state=42, n_jobs=-1).fit(X, y)
+    start = time.perf_counter()
+    compiled = CompiledForest.from_sklearn(forest)
+    compile_seconds = time.perf_counter() - start
+
+    X_test = rng.standard_normal((args.rows, args.features))
+    error = compiled.max_abs_error(forest, X_test)
+
+    sk_single = median_latency(forest.predict_proba, X_test, args.repeats)
+    cf_single = median_latency(compiled.predict_proba, X_test, args.repeats)
+    sk_batch = throughput(forest.predict_proba, X_test)
+    cf_batch = throughput(compiled.predict_proba, X_test)
+
+    print(f"trees: {compiled.n_trees}, nodes: {len(compiled.feature)}, "
+          f"max depth: {compiled.max_depth}, arrays: {compiled.nbytes / 1e6:.1f} MB, "
+          f"compile: {compile_seconds * 1000:.1f} ms")
+    print(f"max abs error vs sklearn: {error:.2e}")
+    print(f"{'':18}{'sklearn':>14}{'compiled':>14}{'speedup':>10}")
+    print(f"{'single row (ms)':18}{sk_single * 1000:14.3f}{cf_single * 1000:14.3f}{sk_single / cf_single:9.1f}x")
+    print(f"{'batch (rows/s)':18}{sk_batch:14.0f}{cf_batch:14.0f}{cf_batch / sk_batch:9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: bulk ARIMA cash-flow forecasting throughput by worker count
+
+Usage:
+    python benchmarks/bench_forecast.py --series 2000 --length 60 --workers 1,2,4,8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_models.ensemble_models import TimeSeriesForecaster
+
+def make_series(n_series, length, rng):
+    """Monthly cash flows: a random walk with drift and yearly seasonality per business"""
+    months = np.arange(length)
+    level = rng.uniform(1e4, 1e6, size=(n_series, 1))
+    drift = rng.normal(0, 0.01, size=(n_series, 1)) * level
+    season = 0.1 * level * np.sin(2 * np.pi * months / 12 + rng.uniform(0, 2 * np.pi, size=(n_series, 1)))
+    noise = np.cumsum(rng.normal(0, 0.02, size=(n_series, length)), axis=1) * level
+    return level + drift * months + season + noise
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--series', type=int, default=2000)
+    parser.add_argument('--length', type=int, default=60)
+    parser.add_argument('--periods', type=int, default=12)
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--chunk-size', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    series = make_series(args.series, args.length, np.random.default_rng(args.seed))
+    # A few series with no data to show that failures stay isolated
+    series[::500] = np.nan
+
+    forecaster = TimeSeriesForecaster()
+    print(f"series: {args.series} x {args.length} points, horizon {args.periods}, cores: {os.cpu_count()}")
+    print(f"{'workers':>8}{'seconds':>10}{'series/s':>10}{'speedup':>9}{'errors':>8}{'first result (s)':>18}")
+
+    baseline = None
+    for workers in (int(w) for w in args.workers.split(',')):
+        start = time.perf_counter()
+        first = None
+        errors = 0
+        count = 0
+        for _, result in forecaster.forecast_many(
+            series, periods=args.periods, max_workers=workers, chunk_size=args.chunk_size
+        ):
+            if first is None:
+                first = time.perf_counter() - start
+            errors += 'error' in result
+            count += 1
+        seconds = time.perf_counter() - start
+        assert count == args.series
+
+        rate = args.series / seconds
+        baseline = baseline or rate
+        print(f"{workers:8d}{seconds:10.2f}{rate:10.1f}{rate / baseline:8.1f}x{errors:8d}{first:18.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: NLPProcessor BERT sentiment throughput by batch size
+
+Usage:
+    python benchmarks/bench_nlp_batch.py --docs 512 --batch-sizes 1,8,16,32,64 --threads 4
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_models.nlp_processor import NLPProcessor
+
+SENTENCES = [
+    "Our cooperative supplies organic produce to twelve local markets.",
+    "Revenue grew steadily over the last three years despite supply shortages.",
+    "The grant will fund two refrigerated trucks and staff training.",
+    "We were badly affected by the flood and lost most of our inventory.",
+    "Customer demand exceeds our current production capacity.",
+    "The business has struggled to secure credit from traditional lenders.",
+    "We employ eighteen people, most of them from the surrounding villages.",
+    "Solar panels would cut our energy costs by roughly forty percent."
+]
+
+def make_applications(n_docs, rng):
+    """Grant applications of 1 to 40 sentences, so lengths vary as in real traffic"""
+    lengths = rng.integers(1, 40, size=n_docs)
+    return [' '.join(rng.choice(SENTENCES, size=length)) for length in lengths]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--docs', type=int, default=512)
+    parser.add_argument('--batch-sizes', default='1,8,16,32,64')
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    texts = make_applications(args.docs, np.random.default_rng(args.seed))
+    processor = NLPProcessor(num_threads=args.threads)
+    tokens = sum(len(ids) for ids in processor.bert_tokenizer(texts, truncation=True, max_length=512)['input_ids'])
+
+    # Warm-up: first calls pay for lazy initialisation inside torch
+    processor.analyze_sentiment_batch(texts[:8], batch_size=8)
+
+    import torch
+    print(f"docs: {args.docs}, tokens: {tokens} (mean {tokens / args.docs:.0f}), "
+          f"intra-op threads: {torch.get_num_threads()}")
+
+    start = time.perf_counter()
+    single = [processor.analyze_sentiment(text)[0] for text in texts]
+    baseline = args.docs / (time.perf_counter() - start)
+    print(f"{'one at a time':>14}{baseline:10.1f} docs/s")
+
+    for batch_size in (int(b) for b in args.batch_sizes.split(',')):
+        start = time.perf_counter()
+        batched = processor.analyze_sentiment_batch(texts, batch_size=batch_size)
+        rate = args.docs / (time.perf_counter() - start)
+        error = np.abs(np.array(batched) - np.array(single)).max()
+        print(f"{'batch ' + str(batch_size):>14}{rate:10.1f} docs/s {rate / baseline:6.1f}x   "
+              f"max abs diff vs single {error:.1e}")
+
+
+if __name__ == '__main__':
+    main()
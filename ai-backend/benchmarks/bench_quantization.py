@@ -0,0 +1,121 @@
+"""
+Benchmark: int8 dynamic quantization vs full precision on a fixed evaluation set
+
+Usage:
+    python benchmarks/bench_quantization.py --model claim --threads 4
+    python benchmarks/bench_quantization.py --model nlp --batch-size 16
+
+--model claim is ClaimAnalysisModel's sentiment model (CLAIM_SENTIMENT_MODEL);
+--model nlp is NLPProcessor's model (NLP_BERT_MODEL). The eval set is
+benchmarks/data/sentiment_eval.jsonl (text, POSITIVE/NEGATIVE label).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_models.quantization import model_size_bytes, quantize_dynamic_int8
+
+EVAL_SET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sentiment_eval.jsonl')
+
+def load_eval_set(path):
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [row['text'] for row in rows], np.array([row['label'] == 'POSITIVE' for row in rows])
+
+def claim_predictor():
+    """(fp32 model, int8 model, predict(model, texts, batch_size) -> P(positive))"""
+    from transformers import pipeline
+    from ml_models.transformer_runtime import claim_sentiment_model, runtime
+
+    # The checkpoint and tokenizer ClaimAnalysisModel loads, not the pipeline's own default
+    name = claim_sentiment_model()
+    fp32 = runtime.model(name)
+    classifier = pipeline("sentiment-analysis", model=fp32, tokenizer=runtime.tokenizer(name))
+    int8 = quantize_dynamic_int8(fp32)
+
+    def predict(model, texts, batch_size):
+        classifier.model = model
+        results = classifier(texts, batch_size=batch_size, truncation=True)
+        return np.array([r['score'] if r['label'] == 'POSITIVE' else 1 - r['score'] for r in results])
+
+    return fp32, int8, predict, True
+
+def nlp_predictor():
+    from ml_models.nlp_processor import NLPProcessor
+
+    processor = NLPProcessor(quantize=False)
+    fp32 = processor.bert_model
+    int8 = quantize_dynamic_int8(fp32)
+
+    def predict(model, texts, batch_size):
+        processor.bert_model = model
+        return np.array(processor.analyze_sentiment_batch(texts, batch_size=batch_size))[:, 1]
+
+    # A base checkpoint (e.g. NLP_BERT_MODEL=bert-base-uncased) has an untrained
+    # classification head: then compare against fp32 only
+    labelled = fp32.config.id2label.get(1) == 'POSITIVE'
+    return fp32, int8, predict, labelled
+
+def measure(predict, model, texts, batch_size, repeats):
+    predict(model, texts[:batch_size], batch_size)  # warm-up
+    single = []
+    for text in texts[:repeats]:
+        start = time.perf_counter()
+        predict(model, [text], 1)
+        single.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    probabilities = predict(model, texts, batch_size)
+    batch_seconds = time.perf_counter() - start
+    return probabilities, float(np.median(single)), len(texts) / batch_seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', choices=['claim', 'nlp'], default='claim')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--eval-set', default=EVAL_SET)
+    args = parser.parse_args()
+
+    import torch
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    texts, labels = load_eval_set(args.eval_set)
+    fp32, int8, predict, labelled = claim_predictor() if args.model == 'claim' else nlp_predictor()
+
+    results = {}
+    for name, model in (('fp32', fp32), ('int8', int8)):
+        probabilities, single, throughput = measure(predict, model, texts, args.batch_size, args.repeats)
+        results[name] = {
+            'probabilities': probabilities,
+            'size_mb': model_size_bytes(model) / 1e6,
+            'single_ms': single * 1000,
+            'docs_per_second': throughput
+        }
+
+    print(f"model: {args.model}, eval texts: {len(texts)}, threads: {torch.get_num_threads()}, "
+          f"quantized engine: {torch.backends.quantized.engine}")
+    print(f"{'':8}{'size (MB)':>10}{'1 doc (ms)':>12}{'docs/s':>10}{'accuracy':>10}")
+    for name, r in results.items():
+        accuracy = np.mean((r['probabilities'] >= 0.5) == labels) if labelled else float('nan')
+        print(f"{name:8}{r['size_mb']:10.1f}{r['single_ms']:12.2f}{r['docs_per_second']:10.1f}{accuracy:10.3f}")
+
+    fp32_p, int8_p = results['fp32']['probabilities'], results['int8']['probabilities']
+    print(f"prediction agreement: {np.mean((fp32_p >= 0.5) == (int8_p >= 0.5)):.3f}, "
+          f"max |P(positive) diff|: {np.abs(fp32_p - int8_p).max():.4f}")
+    print(f"int8 speedup: {results['fp32']['single_ms'] / results['int8']['single_ms']:.2f}x single, "
+          f"{results['int8']['docs_per_second'] / results['fp32']['docs_per_second']:.2f}x batch")
+    if not labelled:
+        print("accuracy not reported: this model's classification head is not fine-tuned")
+
+
+if __name__ == '__main__':
+    main()
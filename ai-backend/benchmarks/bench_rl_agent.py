@@ -0,0 +1,69 @@
+"""
+Benchmark: array-backed Q-table vs the dict-of-arrays Q-table
+
+Usage:
+    python benchmarks/bench_rl_agent.py --states 200000 --features 8
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_models.ensemble_models import ReinforcementLearningAgent
+
+def traced_bytes(fn):
+    tracemalloc.start()
+    fn()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--states', type=int, default=200000)
+    parser.add_argument('--features', type=int, default=8)
+    parser.add_argument('--applicants', type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Distinct states after rounding to 0.1
+    X = rng.integers(-10**6, 10**6, size=(args.states, args.features)) / 10.0
+
+    # Previous representation: {tuple(np.round(features, 1)): np.zeros(n_actions)}
+    legacy = {}
+    def fill_legacy():
+        for row in X:
+            legacy[tuple(np.round(row, 1))] = np.zeros(2)
+    legacy_bytes = traced_bytes(fill_legacy)
+
+    agent = ReinforcementLearningAgent(max_states=args.states, seed=0)
+    def fill_agent():
+        agent._rows(agent.get_states(X), insert=True)
+    # The preallocated q_table is not traced (allocated before) and counted from its used rows
+    agent_bytes = traced_bytes(fill_agent) + len(agent.state_index) * agent.q_table.itemsize * agent.n_actions
+
+    # Bytes per state are the same number as MB per million states
+    print(f"states: {args.states}, features: {args.features}")
+    print(f"dict of arrays:     {legacy_bytes / args.states:8.1f} MB per million states")
+    print(f"array + index map:  {agent_bytes / args.states:8.1f} MB per million states")
+    print(f"memory_footprint(): {agent.memory_footprint()['bytes_per_million_states'] / 1e6:8.1f} MB per million states")
+
+    applicants = X[rng.integers(0, args.states, size=args.applicants)]
+    start = time.perf_counter()
+    for row in applicants[:10000]:
+        agent.decide_loan_approval(row)
+    single = 10000 / (time.perf_counter() - start)
+    start = time.perf_counter()
+    agent.decide_loan_approval_batch(applicants)
+    batch = args.applicants / (time.perf_counter() - start)
+    print(f"decisions/s: one at a time {single:,.0f}, batch {batch:,.0f} ({batch / single:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: resident memory per inference worker, spawned vs forked from a preloaded forkserver
+
+Usage:
+    python benchmarks/bench_runtime_memory.py --workers 4
+    PRELOAD_MODELS=claim QUANTIZE_MODELS=claim python benchmarks/bench_runtime_memory.py
+    PRELOAD_MODELS=claim python benchmarks/bench_runtime_memory.py --nlp
+
+--nlp also builds an NLPProcessor in every worker, next to the claim model,
+and lists the transformer models each worker holds: with the default
+NLP_BERT_MODEL both components use one copy of the weights.
+
+RSS counts shared pages in every worker; PSS splits them between the
+workers sharing them and USS counts private pages only (Linux).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asgi
+from ml_models.transformer_runtime import memory_report, runtime
+
+CLAIM = {"claim_id": "bench", "policy_id": "bench", "amount": 1200,
+         "description": "Storm damage to the warehouse roof and stock"}
+
+_processor = None
+
+def verify_claim(claim, with_nlp):
+    """Claim verification in a worker, optionally next to an NLPProcessor built once per worker"""
+    global _processor
+    if with_nlp and _processor is None:
+        from ml_models.nlp_processor import NLPProcessor
+        _processor = NLPProcessor()
+        _processor.analyze_sentiment(claim['description'])
+    asgi.backend.claim_verification_response(claim)
+    return os.getpid(), runtime.loaded()
+
+def measure(start_method, workers, with_nlp):
+    pool = asgi.InferencePool(workers=workers, start_method=start_method)
+    start = time.perf_counter()
+    pool.start()
+    # Enough concurrent calls that every worker starts and serves at least one request
+    futures = [
+        pool.executor.submit(verify_claim, dict(CLAIM, claim_id=str(i)), with_nlp)
+        for i in range(workers * 4)
+    ]
+    loaded = dict(future.result() for future in futures)
+    ready_seconds = time.perf_counter() - start
+
+    reports = [memory_report(pid) for pid in list(pool.executor._processes)]
+    pool.shutdown()
+    models = sorted({key for keys in loaded.values() for key in keys if key.startswith('model ')})
+    return ready_seconds, reports, models
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--nlp', action='store_true', help="also build an NLPProcessor in every worker")
+    args = parser.parse_args()
+
+    print(f"workers: {args.workers}, served models: {asgi.backend.served_models}")
+    print(f"{'start method':>14}{'ready (s)':>11}{'RSS/worker':>12}{'PSS/worker':>12}"
+          f"{'USS/worker':>12}{'total PSS':>11}   (MB)")
+    for start_method in ('spawn', 'forkserver'):
+        ready_seconds, reports, models = measure(start_method, args.workers, args.nlp)
+        mean = {key: sum(r[key] for r in reports) / len(reports) for key in ('rss_mb', 'pss_mb', 'uss_mb')}
+        total_pss = sum(r['pss_mb'] for r in reports)
+        print(f"{start_method:>14}{ready_seconds:11.1f}{mean['rss_mb']:12.1f}{mean['pss_mb']:12.1f}"
+              f"{mean['uss_mb']:12.1f}{total_pss:11.1f}")
+    print(f"transformer models per worker: {', '.join(models) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+Streaming Federated Averaging (FedAvg)
+Folds model updates from many nodes into a running weighted average as they
+arrive, so memory stays at about two models' size (the running mean and one
+staged update) however many nodes participate.
+
+Updates are NumPy .npz archives (one array per layer), loaded without pickle.
+An update is folded in whole or not at all: every layer is decoded and checked
+before the running mean changes.
+"""
+
+import io
+import threading
+import time
+import uuid
+import zipfile
+import zlib
+
+import numpy as np
+
+class RoundClosedError(ValueError):
+    """Raised when an update arrives after its round has closed"""
+
+
+class RoundExistsError(ValueError):
+    """Raised when a new round reuses the id of an earlier one"""
+
+
+def _positive(name, value, cast):
+    """Coerce a round setting to a positive int/float; None keeps the default"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be a positive number")
+    try:
+        number = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a positive number") from None
+    if not np.isfinite(number) or number <= 0 or (cast is int and number != float(value)):
+        raise ValueError(f"{name} must be a positive {'integer' if cast is int else 'number'}")
+    return number
+
+
+class FederatedRound:
+    """One aggregation round with an expected node count and a deadline"""
+
+    def __init__(self, round_id, expected_nodes=None, timeout_seconds=300, min_nodes=1):
+        self.round_id = round_id
+        self.expected_nodes = expected_nodes
+        self.min_nodes = min_nodes
+        self.started_at = time.time()
+        self.deadline = self.started_at + timeout_seconds
+
+        # Running weighted mean per layer, float64 to keep the fold stable
+        self.mean = None
+        self.shapes = None
+        self.total_samples = 0
+        self.nodes = set()
+        self.rejected_stragglers = 0
+        self.state = 'open'  # open -> completed | failed
+
+    @property
+    def is_open(self):
+        return self.state == 'open'
+
+    def validate(self, node_id, headers, num_samples):
+        """Reject an update from its .npy headers, before any layer is decoded"""
+        if node_id in self.nodes:
+            raise ValueError(f"Node {node_id} already submitted to round {self.round_id}")
+        if num_samples <= 0:
+            raise ValueError("num_samples must be positive")
+        if not headers:
+            raise ValueError("Update has no layers")
+        for name, (_, dtype) in headers.items():
+            if dtype.kind not in 'iuf':
+                raise ValueError(f"Layer {name} has non-numeric dtype {dtype}")
+        shapes = {name: shape for name, (shape, _) in headers.items()}
+        if self.shapes is not None and shapes != self.shapes:
+            raise ValueError("Update layers or shapes do not match the round's model")
+
+    def stage(self, arrays, num_samples):
+        """
+        Decode one node's (name, array) layers into the float64 deltas to add
+        to the running mean. Nothing in the round changes, so a layer that
+        fails to decode leaves the round as it was.
+        """
+        weight = num_samples / (self.total_samples + num_samples)
+        staged = {}
+        for name, array in arrays:
+            update = np.array(array, dtype=np.float64)
+            if not np.isfinite(update).all():
+                raise ValueError(f"Layer {name} contains NaN or infinite values")
+            if self.mean is not None:
+                # delta = (n_i / N) * (x_i - mean), computed in the update's own buffer
+                np.subtract(update, self.mean[name], out=update)
+                update *= weight
+            staged[name] = update
+        return staged
+
+    def commit(self, node_id, staged, num_samples):
+        """Apply deltas from stage() to the running average"""
+        try:
+            if self.mean is None:
+                self.mean = staged
+                self.shapes = {name: layer.shape for name, layer in staged.items()}
+            else:
+                for name, delta in staged.items():
+                    self.mean[name] += delta
+        except Exception:
+            # Some layers may already include this node: the average is no longer valid
+            self.state = 'failed'
+            self.mean = None
+            raise
+        self.total_samples += num_samples
+        self.nodes.add(node_id)
+
+    def fold(self, node_id, arrays, num_samples):
+        """Add one node's (name, array) layers to the running average"""
+        self.commit(node_id, self.stage(arrays, num_samples), num_samples)
+
+    def status(self):
+        return {
+            "round_id": self.round_id,
+            "state": self.state,
+            "nodes_participated": len(self.nodes),
+            "expected_nodes": self.expected_nodes,
+            "min_nodes": self.min_nodes,
+            "total_samples": self.total_samples,
+            "seconds_remaining": max(0.0, self.deadline - time.time()) if self.is_open else 0.0,
+            "rejected_stragglers": self.rejected_stragglers
+        }
+
+
+class StreamingFedAvg:
+    """Round management and streaming aggregation of node updates"""
+
+    def __init__(self, round_timeout=300, min_nodes=1):
+        self.round_timeout = round_timeout
+        self.min_nodes = min_nodes
+        self.rounds = {}
+        self.current_round_id = None
+
+        self.global_model = None
+        self.model_version = 0
+        self._lock = threading.Lock()
+
+    def start_round(self, round_id=None, expected_nodes=None, timeout_seconds=None, min_nodes=None):
+        """
+        Open a new round; any round still open is closed first.
+        The request is validated before that, so a rejected one leaves the open round alone.
+        """
+        if round_id is not None and (not isinstance(round_id, str) or not round_id.strip()):
+            raise ValueError("round_id must be a non-empty string")
+        expected_nodes = _positive('expected_nodes', expected_nodes, int)
+        timeout_seconds = _positive('timeout_seconds', timeout_seconds, float)
+        min_nodes = _positive('min_nodes', min_nodes, int)
+        if expected_nodes is not None and min_nodes is not None and min_nodes > expected_nodes:
+            raise ValueError("min_nodes cannot exceed expected_nodes")
+
+        with self._lock:
+            round_id = round_id or uuid.uuid4().hex[:12]
+            if round_id in self.rounds:
+                raise RoundExistsError(f"Round {round_id} already exists")
+
+            if self.current_round_id is not None:
+                self._close(self.rounds[self.current_round_id])
+
+            fl_round = FederatedRound(
+                round_id,
+                expected_nodes=expected_nodes,
+                timeout_seconds=timeout_seconds or self.round_timeout,
+                min_nodes=min_nodes or self.min_nodes
+            )
+            self.rounds[round_id] = fl_round
+            self.current_round_id = round_id
+            return fl_round.status()
+
+    def submit(self, node_id, update_file, num_samples, round_id=None):
+        """
+        Fold one node's .npz update into the round.
+        Returns the round status; raises ValueError for rejected updates.
+        """
+        with self._lock:
+            fl_round = self._round(round_id)
+            self._check_deadline(fl_round)
+            if not fl_round.is_open:
+                fl_round.rejected_stragglers += 1
+                raise RoundClosedError(f"Round {fl_round.round_id} is {fl_round.state}")
+
+            try:
+                with np.load(update_file, allow_pickle=False) as archive:
+                    fl_round.validate(node_id, archive_headers(archive), num_samples)
+                    staged = fl_round.stage(((name, archive[name]) for name in archive.files), num_samples)
+            except (zipfile.BadZipFile, zlib.error, KeyError, EOFError, OSError) as e:
+                # Corrupt archives (bad CRC, truncated data) are invalid updates, not server errors
+                raise ValueError(f"Could not read update archive: {e}") from e
+
+            try:
+                fl_round.commit(node_id, staged, num_samples)
+            finally:
+                if not fl_round.is_open and self.current_round_id == fl_round.round_id:
+                    self.current_round_id = None
+
+            if fl_round.expected_nodes and len(fl_round.nodes) >= fl_round.expected_nodes:
+                self._close(fl_round)
+            return fl_round.status()
+
+    def close_round(self, round_id=None):
+        with self._lock:
+            fl_round = self._round(round_id)
+            self._close(fl_round)
+            return fl_round.status()
+
+    def round_status(self, round_id=None):
+        with self._lock:
+            fl_round = self._round(round_id)
+            self._check_deadline(fl_round)
+            return fl_round.status()
+
+    def _round(self, round_id):
+        round_id = round_id or self.current_round_id
+        if round_id is None:
+            raise KeyError("No open round")
+        if round_id not in self.rounds:
+            raise KeyError(f"Unknown round: {round_id}")
+        return self.rounds[round_id]
+
+    def _check_deadline(self, fl_round):
+        # Stragglers past the deadline are not waited for
+        if fl_round.is_open and time.time() >= fl_round.deadline:
+            self._close(fl_round)
+
+    def _close(self, fl_round):
+        if not fl_round.is_open:
+            return
+        if len(fl_round.nodes) >= fl_round.min_nodes and fl_round.mean is not None:
+            self.global_model = {
+                name: layer.astype(np.float32) for name, layer in fl_round.mean.items()
+            }
+            self.model_version += 1
+            fl_round.state = 'completed'
+        else:
+            fl_round.state = 'failed'
+        # The aggregate now lives in global_model; drop the float64 copy
+        fl_round.mean = None
+        if self.current_round_id == fl_round.round_id:
+            self.current_round_id = None
+
+    def global_model_bytes(self):
+        """Latest aggregated model as .npz bytes, or None before the first round"""
+        if self.global_model is None:
+            return None
+        return encode_update(self.global_model)
+
+
+def archive_headers(archive):
+    """(shape, dtype) of every layer of an open .npz archive, read from the array headers only"""
+    headers = {}
+    for name in archive.files:
+        with archive.zip.open(name + '.npy') as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+        headers[name] = (shape, dtype)
+    return headers
+
+def encode_update(arrays):
+    """Serialize a {layer_name: ndarray} update to .npz bytes"""
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
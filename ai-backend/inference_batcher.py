@@ -0,0 +1,113 @@
+"""
+Dynamic micro-batching for model inference
+Collects concurrent single-item calls into batches so the model runs
+one padded forward pass per batch instead of one per request.
+"""
+
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+class MicroBatcher:
+    """Batch concurrent inference calls by size and wait time"""
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=10, name="batcher"):
+        # batch_fn takes a list of inputs and returns a list of results
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+        # Stats
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.max_queue_depth = 0
+        self.batch_sizes = Counter()
+
+    def submit(self, item):
+        """Queue one input and return a Future for its result"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return future
+
+    def __call__(self, item, timeout=None):
+        """Run one input through the batcher and wait for its result"""
+        return self.submit(item).result(timeout=timeout)
+
+    def _ensure_worker(self):
+        """Start the batching thread on first use (also after a fork)"""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name=f"{self.name}-worker", daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self):
+        """Block for the first item, then gather more until size or time limit"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            inputs = [item for item, _ in batch]
+
+            try:
+                results = self.batch_fn(inputs)
+                if len(results) != len(inputs):
+                    raise RuntimeError(
+                        f"{self.name}: batch_fn returned {len(results)} results for {len(inputs)} inputs"
+                    )
+            except Exception as e:
+                self.errors += 1
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                self.batches += 1
+                self.items += len(batch)
+                self.batch_sizes[len(batch)] += 1
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        """Queue depth and batch-size statistics"""
+        return {
+            "name": self.name,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self.batch_sizes.items())}
+        }
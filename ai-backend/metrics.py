@@ -0,0 +1,303 @@
+"""
+Request and model-stage metrics for the AI backend
+Latency histograms per route and per model stage, in-flight counts and error
+rates, rendered in the Prometheus text exposition format for /metrics.
+
+In ASGI mode model stages run in pool worker processes: each worker captures
+the stages of a call (capture_stages) and returns them with the result, and
+the serving process merges them (merge_stages) into the histograms it serves.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        # Bucket i counts observations <= buckets[i]; the last one is +Inf
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def render(self, name, **labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(**labels)} {self.sum}")
+        lines.append(f"{name}_count{_labels(**labels)} {self.count}")
+        return lines
+
+
+class SampledProfiler:
+    """
+    Profiles a random sample of requests and prints the hottest functions of
+    the ones slower than slow_ms. Only one request is profiled at a time.
+    """
+
+    def __init__(self, sample_rate=0.0, slow_ms=500, top=20):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_ms / 1000.0
+        self.top = top
+        self._active = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def start(self):
+        """Return a running profiler for this request, or None if not sampled"""
+        if random.random() >= self.sample_rate or not self._active.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool is already active in this process
+            self._active.release()
+            return None
+        return profiler
+
+    def stop(self, profiler, label, seconds):
+        profiler.disable()
+        self._active.release()
+        if seconds < self.slow_seconds:
+            return
+
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(self.top)
+        print(f"Slow request {label} took {seconds * 1000:.1f} ms:\n{out.getvalue()}")
+
+
+class Metrics:
+    """In-process metrics registry"""
+
+    def __init__(self, prefix='mutualchain_ai', buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._lock = threading.Lock()
+
+        self.request_latency = {}     # (route, method) -> Histogram
+        self.requests_total = Counter()  # (route, method, status)
+        self.request_errors = Counter()  # (route, method)
+        self.in_flight = Counter()    # route
+
+        self.stage_latency = {}       # stage -> Histogram
+        self.stage_errors = Counter()  # stage
+        self._capture = threading.local()
+
+    def observe_request(self, route, method, status, seconds):
+        with self._lock:
+            key = (route, method)
+            if key not in self.request_latency:
+                self.request_latency[key] = Histogram(self.buckets)
+            self.request_latency[key].observe(seconds)
+            self.requests_total[(route, method, status)] += 1
+            if status >= 500:
+                self.request_errors[key] += 1
+
+    def observe_stage(self, stage, seconds, failed=False):
+        with self._lock:
+            if stage not in self.stage_latency:
+                self.stage_latency[stage] = Histogram(self.buckets)
+            self.stage_latency[stage].observe(seconds)
+            if failed:
+                self.stage_errors[stage] += 1
+        captured = getattr(self._capture, 'stages', None)
+        if captured is not None:
+            captured.append((stage, seconds, failed))
+
+    @contextmanager
+    def capture_stages(self):
+        """Collect the (stage, seconds, failed) observations made by this thread inside the block"""
+        stages = self._capture.stages = []
+        try:
+            yield stages
+        finally:
+            self._capture.stages = None
+
+    def merge_stages(self, stages):
+        """Record stages captured in another process"""
+        for stage, seconds, failed in stages:
+            self.observe_stage(stage, seconds, failed)
+
+    @contextmanager
+    def time_stage(self, stage):
+        """Time a block of model work, e.g. `with metrics.time_stage('detect_fraud'):`"""
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.observe_stage(stage, time.perf_counter() - start, failed)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        p = self.prefix
+        with self._lock:
+            lines = [
+                f"# HELP {p}_request_duration_seconds Request latency by route",
+                f"# TYPE {p}_request_duration_seconds histogram"
+            ]
+            for (route, method), histogram in sorted(self.request_latency.items()):
+                lines += histogram.render(f"{p}_request_duration_seconds", route=route, method=method)
+
+            lines += [
+                f"# HELP {p}_requests_total Requests by route and status",
+                f"# TYPE {p}_requests_total counter"
+            ]
+            for (route, method, status), count in sorted(self.requests_total.items()):
+                lines.append(f"{p}_requests_total{_labels(route=route, method=method, status=status)} {count}")
+
+            lines += [
+                f"# HELP {p}_request_errors_total Requests answered with a 5xx status",
+                f"# TYPE {p}_request_errors_total counter"
+            ]
+            for (route, method), count in sorted(self.request_errors.items()):
+                lines.append(f"{p}_request_errors_total{_labels(route=route, method=method)} {count}")
+
+            lines += [
+                f"# HELP {p}_requests_in_flight Requests currently being handled",
+                f"# TYPE {p}_requests_in_flight gauge"
+            ]
+            for route, count in sorted(self.in_flight.items()):
+                lines.append(f"{p}_requests_in_flight{_labels(route=route)} {count}")
+
+            lines += [
+                f"# HELP {p}_stage_duration_seconds Model stage latency",
+                f"# TYPE {p}_stage_duration_seconds histogram"
+            ]
+            for stage, histogram in sorted(self.stage_latency.items()):
+                lines += histogram.render(f"{p}_stage_duration_seconds", stage=stage)
+
+            lines += [
+                f"# HELP {p}_stage_errors_total Model stage failures",
+                f"# TYPE {p}_stage_errors_total counter"
+            ]
+            for stage, count in sorted(self.stage_errors.items()):
+                lines.append(f"{p}_stage_errors_total{_labels(stage=stage)} {count}")
+
+        return '\n'.join(lines) + '\n'
+
+    def init_app(self, app, profiler=None, endpoint='/metrics'):
+        """Record every Flask request and serve the metrics at `endpoint`"""
+        profiler = profiler or SampledProfiler(
+            sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+            slow_ms=float(os.environ.get('PROFILE_SLOW_MS', 500))
+        )
+
+        @app.before_request
+        def _start_timer():
+            g.metrics_start = time.perf_counter()
+            g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+            g.metrics_status = 500
+            with self._lock:
+                self.in_flight[g.metrics_route] += 1
+            g.metrics_profiler = profiler.start() if profiler.enabled else None
+
+        @app.after_request
+        def _record_status(response):
+            g.metrics_status = response.status_code
+            return response
+
+        @app.teardown_request
+        def _record_request(exc):
+            start = g.pop('metrics_start', None)
+            if start is None:
+                return
+            seconds = time.perf_counter() - start
+            route = g.metrics_route
+            with self._lock:
+                self.in_flight[route] -= 1
+            self.observe_request(route, request.method, g.metrics_status, seconds)
+
+            active_profiler = g.pop('metrics_profiler', None)
+            if active_profiler is not None:
+                profiler.stop(active_profiler, f"{request.method} {route}", seconds)
+
+        @app.route(endpoint, methods=['GET'])
+        def metrics_endpoint():
+            return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def wrap_asgi(self, app):
+        """Record every request to a Starlette app's own routes (see ASGIMetricsMiddleware)"""
+        return ASGIMetricsMiddleware(app, self)
+
+
+class ASGIMetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and in-flight counts for the
+    Route endpoints of a Starlette app. Requests that fall through to a Mount
+    (the Flask app) are left to init_app's hooks, so none is counted twice.
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    def _route(self, scope):
+        from starlette.routing import Match, Route
+
+        for route in self.app.routes:
+            if isinstance(route, Route) and route.matches(scope)[0] == Match.FULL:
+                return route.path
+        return None
+
+    async def __call__(self, scope, receive, send):
+        route = self._route(scope) if scope['type'] == 'http' else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def record_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        start = time.perf_counter()
+        with self.metrics._lock:
+            self.metrics.in_flight[route] += 1
+        try:
+            await self.app(scope, receive, record_status)
+        finally:
+            with self.metrics._lock:
+                self.metrics.in_flight[route] -= 1
+            self.metrics.observe_request(route, scope['method'], status, time.perf_counter() - start)
+
+
+metrics = Metrics()
@@ -3,6 +3,9 @@ Computer Vision Module
 Uses: OpenCV, Tesseract OCR
 """
 
+import os
+from functools import cached_property
+
 import cv2
 import numpy as np
 try:
@@ -10,75 +13,128 @@ try:
 except ImportError:
     pytesseract = None
 
+class ImageBuffers:
+    """
+    One decoded image and the buffers derived from it, each computed on first
+    use and shared by every analysis run on the image
+    """
+
+    def __init__(self, image):
+        self.color = self.decode(image)
+
+    @staticmethod
+    def decode(image):
+        """BGR image from a file path, encoded bytes (PNG, JPEG, ...) or an array"""
+        if isinstance(image, np.ndarray):
+            img = image if image.ndim == 3 else cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        elif isinstance(image, (bytes, bytearray, memoryview)):
+            # Uploaded evidence is decoded in memory, never written to disk
+            img = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+        elif isinstance(image, (str, os.PathLike)):
+            img = cv2.imread(os.fspath(image))
+        else:
+            raise TypeError(f"Unsupported image type: {type(image).__name__}")
+
+        if img is None:
+            raise ValueError("Could not decode image")
+        return img
+
+    @cached_property
+    def gray(self):
+        return cv2.cvtColor(self.color, cv2.COLOR_BGR2GRAY)
+
+    @cached_property
+    def otsu(self):
+        """Binarized grayscale for OCR"""
+        return cv2.threshold(self.gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+
+    @cached_property
+    def edges(self):
+        return cv2.Canny(self.gray, 50, 150)
+
+
 class ComputerVisionProcessor:
+    ANALYSES = ('invoice', 'damage', 'document')
+
     def __init__(self):
         self.cascade = None
         # Configure Tesseract path if needed
         # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-    
+
+    def analyze(self, image, analyses=ANALYSES):
+        """
+        Run several analyses on one image: a file path, encoded bytes or an array.
+        `analyses` is one name or a sequence of names from ANALYSES. The image is
+        decoded once and grayscale, threshold and edge buffers are computed once
+        for all selected analyses. Returns {analysis: result}; an unknown name or
+        a failed analysis gets {"error": ...} under its own key.
+        """
+        if isinstance(analyses, str):
+            analyses = (analyses,)
+
+        known = [name for name in analyses if name in self.ANALYSES]
+        results = {}
+        if known:
+            try:
+                buffers = ImageBuffers(image)
+            except Exception as e:
+                results = {name: {"error": str(e)} for name in known}
+            else:
+                for name in known:
+                    try:
+                        results[name] = getattr(self, f'_{name}')(buffers)
+                    except Exception as e:
+                        results[name] = {"error": str(e)}
+
+        unknown = f"Unknown analysis (expected one of {', '.join(self.ANALYSES)})"
+        return {name: results[name] if name in results else {"error": unknown} for name in analyses}
+
     def extract_invoice_data(self, image_path):
         """Extract text from invoice using Tesseract OCR"""
-        if pytesseract is None:
-            return {"error": "Tesseract not installed"}
-        
-        try:
-            # Read image with OpenCV
-            img = cv2.imread(image_path)
-            
-            # Preprocess image for better OCR
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
-            
-            # Extract text using Tesseract OCR
-            text = pytesseract.image_to_string(gray)
-            
-            # Extract structured data
-            data = pytesseract.image_to_data(gray, output_type=pytesseract.Output.DICT)
-            
-            return {
-                'text': text,
-                'confidence': np.mean([conf for conf in data['conf'] if conf > 0]),
-                'processed': True
-            }
-        except Exception as e:
-            return {"error": str(e)}
-    
+        return self.analyze(image_path, ('invoice',))['invoice']
+
     def detect_damage(self, image_path):
         """Detect damage in insurance claim photos using Computer Vision"""
-        try:
-            # Read image with OpenCV
-            img = cv2.imread(image_path)
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
-            # Edge detection for damage assessment
-            edges = cv2.Canny(gray, 50, 150)
-            
-            # Calculate damage severity based on edge density
-            damage_ratio = np.count_nonzero(edges) / edges.size
-            
-            return {
-                'damage_detected': damage_ratio > 0.15,
-                'severity': 'high' if damage_ratio > 0.3 else 'medium' if damage_ratio > 0.15 else 'low',
-                'confidence': damage_ratio,
-                'processed': True
-            }
-        except Exception as e:
-            return {"error": str(e)}
-    
+        return self.analyze(image_path, ('damage',))['damage']
+
     def validate_document(self, image_path):
         """Validate document authenticity using OpenCV"""
-        try:
-            img = cv2.imread(image_path)
-            
-            # Check image quality
-            blur_score = cv2.Laplacian(img, cv2.CV_64F).var()
-            
-            return {
-                'valid': blur_score > 100,
-                'quality_score': blur_score,
-                'is_blurry': blur_score < 100
-            }
-        except Exception as e:
-            return {"error": str(e)}
+        return self.analyze(image_path, ('document',))['document']
+
+    def _invoice(self, buffers):
+        if pytesseract is None:
+            return {"error": "Tesseract not installed"}
+
+        # Extract text using Tesseract OCR from the binarized image
+        text = pytesseract.image_to_string(buffers.otsu)
+
+        # Extract structured data
+        data = pytesseract.image_to_data(buffers.otsu, output_type=pytesseract.Output.DICT)
+
+        return {
+            'text': text,
+            'confidence': np.mean([conf for conf in data['conf'] if conf > 0]),
+            'processed': True
+        }
+
+    def _damage(self, buffers):
+        # Calculate damage severity based on edge density
+        edges = buffers.edges
+        damage_ratio = np.count_nonzero(edges) / edges.size
+
+        return {
+            'damage_detected': damage_ratio > 0.15,
+            'severity': 'high' if damage_ratio > 0.3 else 'medium' if damage_ratio > 0.15 else 'low',
+            'confidence': damage_ratio,
+            'processed': True
+        }
+
+    def _document(self, buffers):
+        # Check image quality
+        blur_score = cv2.Laplacian(buffers.color, cv2.CV_64F).var()
+
+        return {
+            'valid': blur_score > 100,
+            'quality_score': blur_score,
+            'is_blurry': blur_score < 100
+        }
@@ -3,21 +3,136 @@ Machine Learning Ensemble Models
 Uses: Neural Networks, Random Forest, K-Means, Isolation Forest, ARIMA, Reinforcement Learning
 """
 
+import hashlib
+import itertools
+import os
+import sys
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier, IsolationForest
-from sklearn.cluster import KMeans
+from sklearn.cluster import MiniBatchKMeans
 from sklearn.neural_network import MLPClassifier
+from threadpoolctl import threadpool_limits
+from . import persistence
+from .compiled_forest import CompiledForest
+from .process_pool import spawn_pool, threads_per_worker
+from .streaming_scorer import StreamingAnomalyScorer
 try:
     from statsmodels.tsa.arima.model import ARIMA
 except ImportError:
     ARIMA = None
 
+# Rows scored per sklearn call by the batch methods; bounds temporary memory
+DEFAULT_CHUNK_SIZE = 10000
+
+# Population stability index above which a feature is considered to have drifted
+PSI_DRIFT_THRESHOLD = 0.25
+# Accuracy drop on new labelled rows, against the held-out rows, that calls for a full retrain
+ACCURACY_DROP_THRESHOLD = 0.1
+# Share of train() rows kept back from fitting to measure that reference accuracy
+REFERENCE_HOLDOUT = 0.1
+
+def _chunks(features, chunk_size):
+    """Yield (start, rows) slices of a feature matrix"""
+    features = np.asarray(features)
+    for start in range(0, len(features), chunk_size):
+        yield start, features[start:start + chunk_size]
+
+def _split_holdout(X, y, fraction):
+    """Split a random `fraction` of rows off for evaluation; (X_fit, y_fit, X_held, y_held)"""
+    X = np.asarray(X)
+    y = np.asarray(y)
+    n_held = int(len(X) * fraction)
+    if n_held == 0:
+        return X, y, None, None
+    order = np.random.default_rng(42).permutation(len(X))
+    fit, held = np.sort(order[n_held:]), np.sort(order[:n_held])
+    # Too few rows to lose any: every class must still be fit
+    if len(np.unique(y[fit])) < len(np.unique(y)):
+        return X, y, None, None
+    return X[fit], y[fit], X[held], y[held]
+
+def _fit_shared(name, estimator, X_spec, y, threads):
+    """
+    Fit one estimator on a training matrix attached from shared memory (worker
+    process), using at most `threads` cores for joblib, OpenMP and BLAS
+    """
+    shm_name, shape, dtype = X_spec
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        X = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        if 'n_jobs' in estimator.get_params():
+            estimator.set_params(n_jobs=threads)
+        start = time.perf_counter()
+        with threadpool_limits(limits=threads):
+            if y is None:
+                estimator.fit(X)
+            else:
+                estimator.fit(X, y)
+        elapsed = time.perf_counter() - start
+        del X
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # The estimator kept a view of X; the segment is released with the process
+            pass
+    return name, estimator, elapsed
+
+def _own_arrays(estimator):
+    """Copy memory-mapped (read-only) arrays so the estimator can be updated in place"""
+    for name, value in list(vars(estimator).items()):
+        if isinstance(value, np.memmap):
+            setattr(estimator, name, np.array(value))
+        elif isinstance(value, list) and any(isinstance(v, np.memmap) for v in value):
+            setattr(estimator, name, [np.array(v) for v in value])
+
+def _decile_bins(X, edges):
+    """Per-feature counts of X over bins split at `edges` (n_features, n_edges)"""
+    counts = np.empty((X.shape[1], edges.shape[1] + 1), dtype=np.int64)
+    for j in range(X.shape[1]):
+        counts[j] = np.bincount(np.searchsorted(edges[j], X[:, j], side='right'), minlength=counts.shape[1])
+    return counts
+
+def _psi(expected, actual, eps=1e-4):
+    """Population stability index per feature between two (n_features, n_bins) count arrays"""
+    p = np.maximum(expected / expected.sum(axis=1, keepdims=True), eps)
+    q = np.maximum(actual / actual.sum(axis=1, keepdims=True), eps)
+    return ((q - p) * np.log(q / p)).sum(axis=1)
+
+
 class CreditScoringEnsemble:
     """Ensemble Models for credit scoring"""
+
+    SEGMENTS = {
+        0: "High-Value Enterprise",
+        1: "Growing Startup",
+        2: "Small Business",
+        3: "Micro Business",
+        4: "New Business"
+    }
+
+    # Fitted estimators written by save() and restored by load()
+    MODELS = ('random_forest', 'neural_network', 'isolation_forest', 'kmeans')
+    # sklearn copies tree nodes into its own buffers on unpickling, so mapping
+    # these files only adds one mmap per tree array; they are read normally
+    TREE_MODELS = ('random_forest', 'isolation_forest')
     
-    def __init__(self):
+    def __init__(self, n_jobs=-1, window_size=50000):
+        # Cores for estimators with built-in parallelism (Random Forest, Isolation Forest)
+        self.n_jobs = n_jobs
+        # Most recent rows the Isolation Forest is refit on by update()
+        self.window_size = window_size
+
         # Random Forest for classification
-        self.random_forest = RandomForestClassifier(n_estimators=100, random_state=42)
+        self.random_forest = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs)
         
         # Neural Networks for deep learning
         self.neural_network = MLPClassifier(
@@ -28,162 +143,917 @@ class CreditScoringEnsemble:
         )
         
         # Isolation Forest for anomaly detection (fraud)
-        self.isolation_forest = IsolationForest(contamination=0.1, random_state=42)
+        self.isolation_forest = IsolationForest(contamination=0.1, random_state=42, n_jobs=n_jobs)
         
-        # K-Means for customer segmentation
-        self.kmeans = KMeans(n_clusters=5, random_state=42)
+        # K-Means for customer segmentation; the mini-batch variant supports partial_fit
+        self.kmeans = MiniBatchKMeans(n_clusters=5, random_state=42, n_init=3, batch_size=1024)
         
         self.is_trained = False
+        self.training_times = {}
+
+        # Training-time statistics for drift detection and the Isolation Forest window
+        self.reference = None
+        self.window = None
+
+        # Optional flat-array Random Forest for low-latency scoring (compile_forest),
+        # used for requests of up to compiled_forest_max_rows rows
+        self.compiled_forest = None
+        self.compiled_forest_max_rows = 128
+        # Set by load(forest='compiled'): random_forest is not fitted and every
+        # request is served by the (memory-mapped) compiled forest
+        self.compiled_only = False
     
-    def train(self, X_train, y_train):
-        """Train all ensemble models"""
-        # Train Random Forest
-        self.random_forest.fit(X_train, y_train)
-        
-        # Train Neural Network
-        self.neural_network.fit(X_train, y_train)
-        
-        # Train Isolation Forest for fraud detection
-        self.isolation_forest.fit(X_train)
-        
-        # Train K-Means for clustering
-        self.kmeans.fit(X_train)
+    def _training_jobs(self, y_train):
+        # (attribute, estimator, target); unsupervised models are fit on X only
+        return [
+            ('random_forest', self.random_forest, y_train),
+            ('neural_network', self.neural_network, y_train),
+            ('isolation_forest', self.isolation_forest, None),
+            ('kmeans', self.kmeans, None)
+        ]
+
+    def train(self, X_train, y_train, parallel=True, max_workers=None, holdout=REFERENCE_HOLDOUT):
+        """
+        Train all ensemble models.
+        With parallel=True the four independent models are fit concurrently
+        in worker processes that read X_train from one shared-memory copy.
+        A `holdout` share of the rows is not fit; the ensemble's accuracy on
+        them is the reference drift_report() compares new labelled rows with.
+        """
+        start = time.perf_counter()
+        self.compiled_forest = None
+        self.compiled_only = False
+        X_fit, y_fit, X_held, y_held = _split_holdout(X_train, y_train, holdout)
+        if parallel:
+            self._train_parallel(X_fit, y_fit, max_workers)
+        else:
+            for name, estimator, y in self._training_jobs(y_fit):
+                model_start = time.perf_counter()
+                if y is None:
+                    estimator.fit(X_fit)
+                else:
+                    estimator.fit(X_fit, y)
+                self.training_times[name] = time.perf_counter() - model_start
         
         self.is_trained = True
-        return {"status": "trained", "models": 4}
+        self._record_reference(X_fit, y_fit, X_held, y_held)
+        return {
+            "status": "trained",
+            "models": 4,
+            "parallel": parallel,
+            "model_seconds": dict(self.training_times),
+            "wall_seconds": time.perf_counter() - start
+        }
+
+    def _train_parallel(self, X_train, y_train, max_workers=None):
+        X = np.ascontiguousarray(X_train)
+        y = np.asarray(y_train)
+        jobs = self._training_jobs(y)
+
+        shm = shared_memory.SharedMemory(create=True, size=max(1, X.nbytes))
+        try:
+            np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)[...] = X
+            X_spec = (shm.name, X.shape, X.dtype.str)
+
+            workers = max_workers or len(jobs)
+            # The cores are split between the concurrent fits instead of each using all of them
+            threads = threads_per_worker(min(workers, len(jobs)))
+            with spawn_pool(workers) as pool:
+                futures = [
+                    pool.submit(_fit_shared, name, estimator, X_spec, target, threads)
+                    for name, estimator, target in jobs
+                ]
+                for future in futures:
+                    name, fitted, elapsed = future.result()
+                    # Fitted copies come back from the workers; predict with all cores again
+                    if 'n_jobs' in fitted.get_params():
+                        fitted.set_params(n_jobs=self.n_jobs)
+                    setattr(self, name, fitted)
+                    self.training_times[name] = elapsed
+        finally:
+            shm.close()
+            shm.unlink()
     
+    def _record_reference(self, X_train, y_train, X_held=None, y_held=None):
+        """Feature deciles, segment distances and label rate of the training data, held-out accuracy"""
+        X = np.asarray(X_train, dtype=np.float64)
+        edges = np.quantile(X, np.linspace(0.1, 0.9, 9), axis=0).T
+        self.reference = {
+            "bin_edges": edges,
+            "bin_counts": _decile_bins(X, edges),
+            "drift_counts": np.zeros((X.shape[1], edges.shape[1] + 1), dtype=np.int64),
+            "segment_distance": self._segment_distance(X),
+            "positive_rate": self._positive_rate(y_train),
+            # None when train() had too few rows to hold any back
+            "accuracy": None if X_held is None else self._accuracy(X_held, y_held),
+            "rows_since_train": 0
+        }
+        self.window = X[-self.window_size:].copy()
+
+    def _segment_distance(self, X):
+        """Mean squared distance of rows to their nearest K-Means centre"""
+        total = 0.0
+        for _, chunk in _chunks(X, DEFAULT_CHUNK_SIZE):
+            total += (self.kmeans.transform(chunk).min(axis=1) ** 2).sum()
+        return total / max(1, len(X))
+
+    def _positive_rate(self, y):
+        # The ensemble's probability is that of the second class, whatever the labels are
+        return float(np.mean(np.asarray(y) == self.neural_network.classes_[1]))
+
+    def _accuracy(self, X, y):
+        positive = self.predict_credit_score_batch(X)["probability"] >= 0.5
+        predicted = self.neural_network.classes_[positive.astype(np.intp)]
+        return float(np.mean(predicted == np.asarray(y)))
+
+    def drift_report(self, X_new, y_new=None):
+        """
+        Drift of X_new against the data of the last full train().
+        Feature PSI is reported for X_new alone and for every row seen by
+        update() since that train() plus X_new.
+        """
+        if self.reference is None:
+            return {"error": "Models not trained"}
+
+        X = np.asarray(X_new, dtype=np.float64)
+        ref = self.reference
+        batch_counts = _decile_bins(X, ref["bin_edges"])
+        batch_psi = _psi(ref["bin_counts"], batch_counts)
+        psi = _psi(ref["bin_counts"], ref["drift_counts"] + batch_counts)
+        drifted = np.flatnonzero(np.maximum(batch_psi, psi) > PSI_DRIFT_THRESHOLD)
+        distance_ratio = self._segment_distance(X) / max(ref["segment_distance"], 1e-12)
+        flagged = float(np.mean(self.detect_fraud_batch(X)["is_fraud"]))
+
+        report = {
+            "rows": len(X),
+            "rows_since_train": ref["rows_since_train"] + len(X),
+            "batch_psi": batch_psi.tolist(),
+            "feature_psi": psi.tolist(),
+            "max_psi": float(max(batch_psi.max(), psi.max())),
+            "drifted_features": drifted.tolist(),
+            "segment_distance_ratio": float(distance_ratio),
+            "fraud_flag_rate": flagged,
+            "expected_fraud_flag_rate": self.isolation_forest.contamination
+        }
+        accuracy_drop = 0.0
+        if y_new is not None:
+            report["positive_rate"] = self._positive_rate(y_new)
+            report["reference_positive_rate"] = ref["positive_rate"]
+            report["accuracy"] = self._accuracy(X, y_new)
+            report["reference_accuracy"] = ref["accuracy"]
+            if ref["accuracy"] is not None:
+                accuracy_drop = ref["accuracy"] - report["accuracy"]
+
+        # The Random Forest is only refit by train(); shifted inputs, segments or accuracy mean it is stale
+        report["needs_full_retrain"] = bool(
+            len(drifted) or distance_ratio > 1.5 or accuracy_drop > ACCURACY_DROP_THRESHOLD
+        )
+        return report
+
+    def update(self, X_new, y_new, epochs=1):
+        """
+        Incrementally update the ensemble with new labelled rows.
+        The neural network and K-Means continue training with partial_fit and the
+        Isolation Forest is refit on the last window_size rows, so the cost grows
+        with X_new rather than the training history. The Random Forest is left
+        as is; the returned drift report says when a full train() is due.
+        """
+        if not self.is_trained:
+            return {"error": "Models not trained"}
+
+        start = time.perf_counter()
+        X = np.asarray(X_new, dtype=np.float64)
+        y = np.asarray(y_new)
+        drift = self.drift_report(X, y)
+
+        # Models loaded with mmap_mode='r' share read-only arrays; take private copies
+        _own_arrays(self.neural_network)
+        _own_arrays(self.kmeans)
+
+        update_times = {}
+        model_start = time.perf_counter()
+        for _ in range(epochs):
+            self.neural_network.partial_fit(X, y)
+        update_times['neural_network'] = time.perf_counter() - model_start
+
+        model_start = time.perf_counter()
+        self.kmeans.partial_fit(X)
+        update_times['kmeans'] = time.perf_counter() - model_start
+
+        model_start = time.perf_counter()
+        self.window = np.concatenate([self.window, X])[-self.window_size:]
+        self.isolation_forest.fit(self.window)
+        update_times['isolation_forest'] = time.perf_counter() - model_start
+
+        self.reference["drift_counts"] += _decile_bins(X, self.reference["bin_edges"])
+        self.reference["rows_since_train"] += len(X)
+        return {
+            "status": "updated",
+            "rows": len(X),
+            "model_seconds": update_times,
+            "wall_seconds": time.perf_counter() - start,
+            "drift": drift,
+            "needs_full_retrain": drift["needs_full_retrain"]
+        }
+
+    def compile_forest(self, X_check=None, atol=1e-9, max_rows=128):
+        """
+        Compile the trained Random Forest into flat arrays for low-latency scoring.
+        If X_check is given, the compiled forest must match sklearn within atol.
+        Larger batches than max_rows keep using sklearn's Cython batch path.
+        """
+        if not self.is_trained:
+            return {"error": "Models not trained"}
+        if self.compiled_only:
+            return {"error": "Loaded with forest='compiled': no sklearn Random Forest to compile"}
+
+        compiled = CompiledForest.from_sklearn(self.random_forest)
+        result = {
+            "compiled": True,
+            "trees": compiled.n_trees,
+            "nodes": len(compiled.feature),
+            "bytes": compiled.nbytes
+        }
+        if X_check is not None:
+            error = compiled.max_abs_error(self.random_forest, X_check)
+            if error > atol:
+                raise ValueError(f"Compiled forest differs from sklearn by {error:.3g} (atol {atol})")
+            result["max_abs_error"] = error
+
+        self.compiled_forest = compiled
+        self.compiled_forest_max_rows = max_rows
+        return result
+
+    def save(self, path):
+        """
+        Save the trained ensemble to the directory `path`.
+        Estimators are stored as uncompressed joblib files and the compiled
+        forest (if any) as .npy arrays, listed with checksums in manifest.json.
+        """
+        if not self.is_trained:
+            return {"error": "Models not trained"}
+        if self.compiled_only:
+            return {"error": "Loaded with forest='compiled': the sklearn Random Forest is not available to save"}
+
+        os.makedirs(path, exist_ok=True)
+        files = {name: persistence.dump_object(path, name, getattr(self, name)) for name in self.MODELS}
+        compiled = None
+        if self.compiled_forest is not None:
+            for name, array in self.compiled_forest.arrays().items():
+                files[f"compiled_forest.{name}"] = persistence.dump_array(path, f"compiled_forest.{name}", array)
+            compiled = self.compiled_forest.params()
+        if self.reference is not None:
+            files["reference"] = persistence.dump_object(path, "reference", self.reference)
+            files["window"] = persistence.dump_array(path, "window", self.window)
+
+        persistence.write_manifest(path, type(self).__name__, files, {
+            "n_jobs": self.n_jobs,
+            "window_size": self.window_size,
+            "training_times": self.training_times,
+            "compiled_forest": compiled,
+            "compiled_forest_max_rows": self.compiled_forest_max_rows
+        })
+        return {
+            "saved": True,
+            "path": path,
+            "files": len(files),
+            "bytes": sum(os.path.getsize(os.path.join(path, f)) for f in files.values())
+        }
+
+    @classmethod
+    def load(cls, path, mmap_mode='r', verify=True, forest='sklearn'):
+        """
+        Load an ensemble saved with save().
+        With mmap_mode='r' the compiled forest and the arrays of the neural
+        network and K-Means are memory-mapped read-only and shared between
+        processes through the page cache. verify=False skips the checksum pass.
+
+        The sklearn tree models are unpickled into private memory in every
+        process. forest='compiled' skips the sklearn Random Forest and serves
+        every request from the compiled forest, so the forest itself is shared
+        too (the ensemble must have been saved after compile_forest()). It is
+        slower than sklearn for large batches, and the Isolation Forest is
+        still private to each process.
+        """
+        if forest not in ('sklearn', 'compiled'):
+            raise ValueError(f"forest must be 'sklearn' or 'compiled', got {forest!r}")
+
+        start = time.perf_counter()
+        manifest = persistence.read_manifest(path, cls.__name__, verify=verify)
+        attributes = manifest["attributes"]
+        compiled = attributes.get("compiled_forest")
+        if forest == 'compiled' and not compiled:
+            raise persistence.ModelFormatError(f"{path} has no compiled forest: save after compile_forest()")
+
+        ensemble = cls(n_jobs=attributes.get("n_jobs", -1), window_size=attributes.get("window_size", 50000))
+        for name in cls.MODELS:
+            if name == 'random_forest' and forest == 'compiled':
+                continue
+            mode = None if name in cls.TREE_MODELS else mmap_mode
+            setattr(ensemble, name, persistence.load_object(path, manifest, name, mode))
+        ensemble.training_times = attributes.get("training_times", {})
+
+        if compiled:
+            arrays = {
+                name: persistence.load_array(path, manifest, f"compiled_forest.{name}", mmap_mode)
+                for name in CompiledForest.ARRAYS
+            }
+            ensemble.compiled_forest = CompiledForest(
+                max_depth=compiled["max_depth"],
+                n_features=compiled["n_features"],
+                classes=np.array(compiled["classes"]),
+                **arrays
+            )
+            ensemble.compiled_forest_max_rows = attributes["compiled_forest_max_rows"]
+            ensemble.compiled_only = forest == 'compiled'
+
+        if "reference" in manifest["files"]:
+            # Updated in place by update(), so never memory-mapped
+            ensemble.reference = persistence.load_object(path, manifest, "reference", mmap_mode=None)
+            ensemble.window = persistence.load_array(path, manifest, "window", mmap_mode)
+
+        ensemble.is_trained = True
+        ensemble.load_seconds = time.perf_counter() - start
+        return ensemble
+
+    def _forest_for(self, n_rows):
+        if self.compiled_only or (self.compiled_forest is not None and n_rows <= self.compiled_forest_max_rows):
+            return self.compiled_forest
+        return self.random_forest
+
     def predict_credit_score(self, features):
         """Predict credit score using ensemble of models"""
         if not self.is_trained:
             return {"error": "Models not trained"}
         
-        # Random Forest prediction
-        rf_pred = self.random_forest.predict_proba(features)
-        
-        # Neural Network prediction
-        nn_pred = self.neural_network.predict_proba(features)
-        
-        # Ensemble prediction (weighted average)
-        ensemble_pred = (rf_pred * 0.6 + nn_pred * 0.4)
-        
-        return {
-            'credit_score': int(ensemble_pred[0][1] * 850),
-            'probability': float(ensemble_pred[0][1]),
-            'model': 'ensemble'
-        }
+        return self.predict_credit_score_batch(features, as_records=True)[0]
+
+    def predict_credit_score_batch(self, features, chunk_size=DEFAULT_CHUNK_SIZE, as_records=False):
+        """Credit scores for every row of `features`, scored chunk by chunk"""
+        if not self.is_trained:
+            return {"error": "Models not trained"}
+
+        probability = np.empty(len(features), dtype=np.float64)
+        for start, chunk in _chunks(features, chunk_size):
+            # Random Forest and Neural Network predictions
+            rf_pred = self._forest_for(len(chunk)).predict_proba(chunk)
+            nn_pred = self.neural_network.predict_proba(chunk)
+
+            # Ensemble prediction (weighted average)
+            probability[start:start + len(chunk)] = (rf_pred * 0.6 + nn_pred * 0.4)[:, 1]
+
+        credit_score = (probability * 850).astype(np.int64)
+        if as_records:
+            return [
+                {'credit_score': score, 'probability': p, 'model': 'ensemble'}
+                for score, p in zip(credit_score.tolist(), probability.tolist())
+            ]
+        return {'credit_score': credit_score, 'probability': probability, 'model': 'ensemble'}
     
     def detect_fraud(self, features):
         """Detect fraudulent applications using Isolation Forest"""
         if not self.is_trained:
             return {"error": "Models not trained"}
         
-        prediction = self.isolation_forest.predict(features)
-        anomaly_score = self.isolation_forest.score_samples(features)
-        
-        return {
-            'is_fraud': prediction[0] == -1,
-            'anomaly_score': float(anomaly_score[0]),
-            'confidence': abs(float(anomaly_score[0]))
-        }
+        return self.detect_fraud_batch(features, as_records=True)[0]
+
+    def detect_fraud_batch(self, features, chunk_size=DEFAULT_CHUNK_SIZE, as_records=False):
+        """Isolation Forest anomaly scores and fraud flags for every row"""
+        if not self.is_trained:
+            return {"error": "Models not trained"}
+
+        anomaly_score = np.empty(len(features), dtype=np.float64)
+        for start, chunk in _chunks(features, chunk_size):
+            anomaly_score[start:start + len(chunk)] = self.isolation_forest.score_samples(chunk)
+
+        # Same rule as IsolationForest.predict, without scoring every row twice
+        is_fraud = (anomaly_score - self.isolation_forest.offset_) < 0
+        if as_records:
+            return [
+                {'is_fraud': fraud, 'anomaly_score': score, 'confidence': abs(score)}
+                for fraud, score in zip(is_fraud.tolist(), anomaly_score.tolist())
+            ]
+        return {'is_fraud': is_fraud, 'anomaly_score': anomaly_score, 'confidence': np.abs(anomaly_score)}
     
+    def detect_fraud_stream(self, source, flagged_path=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=0):
+        """
+        Isolation Forest scoring of an archive too large for memory: `source` is a
+        .npy path (memory-mapped), an array or a generator of rows. Flagged rows
+        are written to flagged_path as CSV; returns counts and score quantiles.
+        """
+        if not self.is_trained:
+            return {"error": "Models not trained"}
+
+        scorer = StreamingAnomalyScorer(self.isolation_forest, chunk_size=chunk_size, workers=workers)
+        return scorer.run(source, flagged_path=flagged_path)
+
     def segment_customer(self, features):
         """Segment customers using K-Means clustering"""
         if not self.is_trained:
             return {"error": "Models not trained"}
         
-        cluster = self.kmeans.predict(features)
-        
-        segments = {
-            0: "High-Value Enterprise",
-            1: "Growing Startup",
-            2: "Small Business",
-            3: "Micro Business",
-            4: "New Business"
-        }
-        
-        return {
-            'segment': segments.get(cluster[0], "Unknown"),
-            'cluster_id': int(cluster[0])
-        }
+        return self.segment_customer_batch(features, as_records=True)[0]
+
+    def segment_customer_batch(self, features, chunk_size=DEFAULT_CHUNK_SIZE, as_records=False):
+        """K-Means segment for every row"""
+        if not self.is_trained:
+            return {"error": "Models not trained"}
+
+        cluster = np.empty(len(features), dtype=np.int64)
+        for start, chunk in _chunks(features, chunk_size):
+            cluster[start:start + len(chunk)] = self.kmeans.predict(chunk)
+
+        segment = np.array([self.SEGMENTS.get(c, "Unknown") for c in range(self.kmeans.n_clusters)])[cluster]
+        if as_records:
+            return [
+                {'segment': name, 'cluster_id': cluster_id}
+                for name, cluster_id in zip(segment.tolist(), cluster.tolist())
+            ]
+        return {'segment': segment, 'cluster_id': cluster}
+
+
+def _arima_name(order):
+    return f"ARIMA({','.join(str(term) for term in order)})"
+
+def _forecast_chunk(items, order, periods):
+    """Fit and forecast a list of (series_id, values); failures are reported per series"""
+    results = []
+    # One BLAS thread per worker process; the pool provides the parallelism
+    with threadpool_limits(limits=1):
+        for series_id, values in items:
+            try:
+                with warnings.catch_warnings(record=True) as caught:
+                    warnings.simplefilter('always')
+                    forecast = ARIMA(values, order=order).fit().forecast(steps=periods)
+                result = {
+                    'forecast': np.asarray(forecast).tolist(),
+                    'periods': periods,
+                    'model': _arima_name(order)
+                }
+                if caught:
+                    result['warnings'] = sorted({str(w.message) for w in caught})
+            except Exception as e:
+                result = {"error": str(e)}
+            results.append((series_id, result))
+    return results
+
+def _series_hash(values):
+    return hashlib.sha256(values.tobytes()).hexdigest()
+
+
+class _CachedFit:
+    """A fitted ARIMA result, the observations it covers and its forecasts so far"""
+
+    def __init__(self, fitted_model, values, appended=0):
+        self.fitted_model = fitted_model
+        self.n_obs = len(values)
+        self.data_hash = _series_hash(values)
+        self.appended = appended      # observations added with append() since the last full fit
+        self.forecasts = {}           # periods -> forecast list
 
 
 class TimeSeriesForecaster:
     """ARIMA model for time series forecasting"""
     
-    def __init__(self):
+    ORDER = (5, 1, 0)
+
+    def __init__(self, max_series=1024, max_append=6, refit_after=24):
         self.model = None
+        self.fitted_model = None
         self.is_fitted = False
+
+        # LRU cache of fits, keyed by series_id (or the data hash when no id is given).
+        # Up to max_append new observations extend a cached fit with its current
+        # parameters; after refit_after appended observations the series is refit.
+        self.max_series = max_series
+        self.max_append = max_append
+        self.refit_after = refit_after
+        self._fits = OrderedDict()
+        self._fits_lock = threading.Lock()
+        self.fit_counts = {"cached": 0, "extended": 0, "full": 0}
     
-    def forecast_cash_flow(self, historical_data, periods=12):
-        """Forecast cash flow using ARIMA"""
+    def forecast_cash_flow(self, historical_data, periods=12, series_id=None):
+        """
+        Forecast cash flow using ARIMA.
+        Fits are cached per series: repeated requests for unchanged data return the
+        cached forecast, and a few new observations extend the cached fit instead
+        of refitting on the full history.
+        """
         if ARIMA is None:
             return {"error": "statsmodels not installed"}
         
         try:
-            # Fit ARIMA model
-            self.model = ARIMA(historical_data, order=(5, 1, 0))
-            fitted_model = self.model.fit()
-            
-            # Forecast future periods
-            forecast = fitted_model.forecast(steps=periods)
-            
+            values = np.asarray(historical_data, dtype=np.float64)
+            key = series_id if series_id is not None else _series_hash(values)
+            entry, fit = self._cached_fit(key, values)
+
+            self.model = entry.fitted_model.model
+            self.fitted_model = entry.fitted_model
             self.is_fitted = True
             
+            # Forecast future periods
+            forecast = entry.forecasts.get(periods)
+            if forecast is None:
+                forecast = np.asarray(entry.fitted_model.forecast(steps=periods)).tolist()
+                entry.forecasts[periods] = forecast
+
             return {
-                'forecast': forecast.tolist(),
+                'forecast': list(forecast),
                 'periods': periods,
-                'model': 'ARIMA(5,1,0)'
+                'model': _arima_name(self.ORDER),
+                'fit': fit
             }
         except Exception as e:
             return {"error": str(e)}
 
+    def _cached_fit(self, key, values):
+        """Return (entry, 'cached' | 'extended' | 'full') for the series `key` holding `values`"""
+        with self._fits_lock:
+            entry = self._fits.get(key)
+            if entry is not None:
+                self._fits.move_to_end(key)
+
+        fit = 'full'
+        if entry is not None and entry.n_obs <= len(values) and \
+                _series_hash(values[:entry.n_obs]) == entry.data_hash:
+            new_obs = len(values) - entry.n_obs
+            if new_obs == 0:
+                fit = 'cached'
+            elif new_obs <= self.max_append and entry.appended + new_obs <= self.refit_after:
+                # Keep the estimated parameters and only run the filter over the new data
+                entry = _CachedFit(
+                    entry.fitted_model.append(values[entry.n_obs:], refit=False),
+                    values,
+                    appended=entry.appended + new_obs
+                )
+                fit = 'extended'
+
+        if fit == 'full':
+            entry = _CachedFit(ARIMA(values, order=self.ORDER).fit(), values)
+
+        with self._fits_lock:
+            self.fit_counts[fit] += 1
+            if fit != 'cached':
+                self._fits[key] = entry
+                self._fits.move_to_end(key)
+                while len(self._fits) > self.max_series:
+                    self._fits.popitem(last=False)
+        return entry, fit
+
+    def forecast_many(self, series, periods=12, max_workers=None, chunk_size=16, max_pending=None):
+        """
+        Forecast many series in parallel worker processes.
+        `series` is a 2D array (one series per row, ids are row numbers) or a
+        mapping of series id to values. Yields (series_id, result) as chunks of
+        chunk_size series finish, in completion order; a failing series gets an
+        error result without affecting the others. At most max_pending chunks
+        (default 2 per worker) are queued, so inputs can be streamed.
+        Bulk fits bypass the per-series cache.
+        """
+        items = series.items() if hasattr(series, 'items') else enumerate(series)
+        items = ((series_id, np.asarray(values, dtype=np.float64)) for series_id, values in items)
+        chunks = iter(lambda: list(itertools.islice(items, chunk_size)), [])
+
+        if ARIMA is None:
+            for chunk in chunks:
+                for series_id, _ in chunk:
+                    yield series_id, {"error": "statsmodels not installed"}
+            return
+
+        max_workers = max_workers or os.cpu_count() or 1
+        if max_workers == 1:
+            for chunk in chunks:
+                yield from _forecast_chunk(chunk, self.ORDER, periods)
+            return
+
+        max_pending = max_pending or 2 * max_workers
+        pool = spawn_pool(max_workers)
+        pending = {}
+        try:
+            for chunk in itertools.chain(chunks, [None]):
+                if chunk is not None:
+                    try:
+                        future = pool.submit(_forecast_chunk, chunk, self.ORDER, periods)
+                    except BrokenProcessPool:
+                        # A worker died since the last wait; this chunk never ran, so it goes to a new pool
+                        pool.shutdown(wait=False)
+                        pool = spawn_pool(max_workers)
+                        future = pool.submit(_forecast_chunk, chunk, self.ORDER, periods)
+                    pending[future] = (chunk, pool)
+                    if len(pending) < max_pending:
+                        continue
+
+                while pending and (chunk is None or len(pending) >= max_pending):
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        done_chunk, done_pool = pending.pop(future)
+                        try:
+                            yield from future.result()
+                        except Exception as e:
+                            # The worker itself failed (e.g. was killed); report the whole chunk
+                            for series_id, _ in done_chunk:
+                                yield series_id, {"error": f"worker failed: {e}"}
+                            # A dead worker fails every chunk queued on its pool; later chunks get a new one
+                            if isinstance(e, BrokenProcessPool) and done_pool is pool:
+                                pool.shutdown(wait=False)
+                                pool = spawn_pool(max_workers)
+        finally:
+            pool.shutdown()
+
+    def cache_stats(self):
+        with self._fits_lock:
+            return {"series": len(self._fits), "max_series": self.max_series, **self.fit_counts}
+
+    def clear_cache(self):
+        with self._fits_lock:
+            self._fits.clear()
+
+    def forecast(self, periods=12):
+        """Forecast from the last fit (or a loaded one) without refitting"""
+        if not self.is_fitted:
+            return {"error": "Model not fitted"}
+
+        forecast = self.fitted_model.forecast(steps=periods)
+        return {
+            'forecast': np.asarray(forecast).tolist(),
+            'periods': periods,
+            'model': _arima_name(self.ORDER)
+        }
+
+    def save(self, path):
+        """Save the fitted ARIMA results to the directory `path` (see CreditScoringEnsemble.save)"""
+        if not self.is_fitted:
+            return {"error": "Model not fitted"}
+
+        os.makedirs(path, exist_ok=True)
+        files = {"fitted_model": persistence.dump_object(path, "fitted_model", self.fitted_model)}
+        persistence.write_manifest(path, type(self).__name__, files, {"order": list(self.ORDER)})
+        return {"saved": True, "path": path, "files": len(files)}
+
+    @classmethod
+    def load(cls, path, verify=True):
+        """Load a forecaster saved with save(); forecast() then works without refitting"""
+        manifest = persistence.read_manifest(path, cls.__name__, verify=verify)
+        forecaster = cls()
+        forecaster.fitted_model = persistence.load_object(
+            path, manifest, "fitted_model", mmap_mode=None  # statsmodels needs writable arrays
+        )
+        forecaster.model = forecaster.fitted_model.model
+        forecaster.is_fitted = True
+        return forecaster
+
+
+# FNV-1a constants for hashing discretized state vectors to 64-bit keys
+_FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME = np.uint64(0x100000001b3)
+
+
+class ReplayBuffer:
+    """Fixed-capacity ring buffer of (state, action, reward, next_state) transitions"""
+
+    FIELDS = ('states', 'actions', 'rewards', 'next_states')
+
+    def __init__(self, capacity=100_000):
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.position = 0   # next slot to write
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, states, actions, rewards, next_states):
+        """Append transitions (arrays of equal length), overwriting the oldest when full"""
+        columns = [np.atleast_1d(np.asarray(c))[-self.capacity:] for c in (states, actions, rewards, next_states)]
+        n = len(columns[0])
+        slots = (self.position + np.arange(n)) % self.capacity
+        for name, column in zip(self.FIELDS, columns):
+            getattr(self, name)[slots] = column
+        self.position = int((self.position + n) % self.capacity)
+        self.size = min(self.capacity, self.size + n)
+
+    def sample(self, batch_size, rng):
+        """Indices of batch_size transitions drawn uniformly with replacement"""
+        return rng.integers(0, self.size, size=batch_size)
+
+    def arrays(self):
+        """Stored transitions, oldest first"""
+        order = (self.position - self.size + np.arange(self.size)) % self.capacity
+        return {name: getattr(self, name)[order] for name in self.FIELDS}
+
 
 class ReinforcementLearningAgent:
     """Reinforcement Learning for loan approval optimization"""
     
-    def __init__(self, n_actions=2):
+    def __init__(self, n_actions=2, max_states=1_000_000, seed=None, replay_capacity=100_000):
         self.n_actions = n_actions  # Approve or Reject
-        self.q_table = {}
         self.learning_rate = 0.1
         self.discount_factor = 0.95
         self.epsilon = 0.1
+        self.rng = np.random.default_rng(seed)
+
+        # Q-values of every known state, one row per state. np.zeros only commits
+        # memory for the pages actually written, so unused capacity is not resident.
+        self.max_states = max_states
+        self.q_table = np.zeros((max_states, n_actions), dtype=np.float32)
+        # 64-bit state hash -> row of q_table
+        self.state_index = {}
+        self.dropped_states = 0
+
+        # Past transitions for batched learning (remember / learn_batch)
+        self.replay = ReplayBuffer(replay_capacity)
     
     def get_state(self, features):
-        """Convert features to state representation"""
-        return tuple(np.round(features, 1))
-    
+        """Convert features to state representation (64-bit hash of features rounded to 0.1)"""
+        return self.get_states(np.atleast_2d(features))[0]
+
+    def get_states(self, features):
+        """State keys for every row of a feature matrix"""
+        codes = np.rint(np.asarray(features, dtype=np.float64) * 10).astype(np.int64)
+        keys = np.full(len(codes), _FNV_OFFSET, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for column in codes.T:
+                keys ^= column.view(np.uint64)
+                keys *= _FNV_PRIME
+        return keys.view(np.int64).tolist()
+
+    def _rows(self, states, insert=False):
+        """q_table rows for state keys; -1 for unknown states (or once max_states is reached)"""
+        if not insert:
+            return np.fromiter((self.state_index.get(s, -1) for s in states), dtype=np.int64, count=len(states))
+
+        rows = np.empty(len(states), dtype=np.int64)
+        for i, state in enumerate(states):
+            row = self.state_index.get(state)
+            if row is None:
+                if len(self.state_index) < self.max_states:
+                    row = self.state_index[state] = len(self.state_index)
+                else:
+                    self.dropped_states += 1
+                    row = -1
+            rows[i] = row
+        return rows
+
+    def _q_values(self, rows):
+        """Q-values for rows, zeros for unknown states"""
+        return np.where((rows >= 0)[:, None], self.q_table[np.maximum(rows, 0)], 0)
+
     def choose_action(self, state):
         """Choose action using epsilon-greedy policy"""
-        if np.random.random() < self.epsilon:
-            return np.random.randint(self.n_actions)
+        if self.rng.random() < self.epsilon:
+            return int(self.rng.integers(self.n_actions))
         
-        if state not in self.q_table:
-            self.q_table[state] = np.zeros(self.n_actions)
-        
-        return np.argmax(self.q_table[state])
+        return int(np.argmax(self._q_values(self._rows([state]))[0]))
     
     def learn(self, state, action, reward, next_state):
         """Update Q-table using Q-learning algorithm"""
-        if state not in self.q_table:
-            self.q_table[state] = np.zeros(self.n_actions)
-        if next_state not in self.q_table:
-            self.q_table[next_state] = np.zeros(self.n_actions)
+        row, next_row = self._rows([state, next_state], insert=True)
+        if row < 0:
+            return {"updated": False, "error": "Q-table full"}
         
         # Q-learning update rule
-        old_value = self.q_table[state][action]
-        next_max = np.max(self.q_table[next_state])
+        old_value = float(self.q_table[row, action])
+        next_max = float(self.q_table[next_row].max()) if next_row >= 0 else 0.0
         new_value = old_value + self.learning_rate * (reward + self.discount_factor * next_max - old_value)
-        self.q_table[state][action] = new_value
+        self.q_table[row, action] = new_value
         
         return {"updated": True, "new_q_value": new_value}
     
+    def remember(self, features, actions, rewards, next_features):
+        """Store transitions for a matrix of applicants, e.g. a backlog of historical loan outcomes"""
+        self.replay.add(
+            self.get_states(np.atleast_2d(features)),
+            actions,
+            rewards,
+            self.get_states(np.atleast_2d(next_features))
+        )
+
+    def learn_batch(self, batch_size=256, n_batches=1):
+        """
+        Q-learning on mini-batches sampled from the replay buffer.
+        Each batch is one vectorized update. Transitions that hit the same
+        (state, action) within a batch are averaged, so a pair sampled k times
+        moves by lr x its mean TD error, not k times that.
+        """
+        if not len(self.replay):
+            return {"updated": 0, "error": "Replay buffer empty"}
+
+        updated = 0
+        mean_abs_td = 0.0
+        for _ in range(n_batches):
+            batch = self.replay.sample(batch_size, self.rng)
+            rows = self._rows(self.replay.states[batch].tolist(), insert=True)
+            next_rows = self._rows(self.replay.next_states[batch].tolist(), insert=True)
+            actions = self.replay.actions[batch]
+            rewards = self.replay.rewards[batch]
+
+            known = rows >= 0
+            rows, next_rows, actions, rewards = rows[known], next_rows[known], actions[known], rewards[known]
+
+            next_max = self._q_values(next_rows).max(axis=1)
+            td_error = rewards + self.discount_factor * next_max - self.q_table[rows, actions]
+            # Every copy's TD error is computed from the same old Q-value: average them per pair
+            pairs, inverse = np.unique(rows * self.n_actions + actions, return_inverse=True)
+            mean_td = np.bincount(inverse, weights=td_error) / np.bincount(inverse)
+            pair_rows, pair_actions = np.divmod(pairs, self.n_actions)
+            self.q_table[pair_rows, pair_actions] += (self.learning_rate * mean_td).astype(np.float32)
+
+            updated += len(rows)
+            mean_abs_td += float(np.abs(td_error).mean()) if len(rows) else 0.0
+
+        return {"updated": updated, "mean_abs_td_error": mean_abs_td / n_batches}
+
+    def save(self, path):
+        """
+        Snapshot the Q-table, state index and replay buffer to the directory `path`
+        as .npy arrays with a manifest (see ml_models.persistence); nothing is pickled.
+        """
+        os.makedirs(path, exist_ok=True)
+        n_states = len(self.state_index)
+        arrays = {
+            "q_table": self.q_table[:n_states],
+            # Rows are assigned in insertion order, which the dict preserves
+            "state_keys": np.fromiter(self.state_index, dtype=np.int64, count=n_states),
+            **{f"replay.{name}": array for name, array in self.replay.arrays().items()}
+        }
+        files = {name: persistence.dump_array(path, name, array) for name, array in arrays.items()}
+        persistence.write_manifest(path, type(self).__name__, files, {
+            "n_actions": self.n_actions,
+            "max_states": self.max_states,
+            "replay_capacity": self.replay.capacity,
+            "learning_rate": self.learning_rate,
+            "discount_factor": self.discount_factor,
+            "epsilon": self.epsilon,
+            "dropped_states": self.dropped_states
+        })
+        return {"saved": True, "path": path, "states": n_states, "transitions": len(self.replay)}
+
+    @classmethod
+    def load(cls, path, seed=None, verify=True):
+        """Restore an agent saved with save()"""
+        manifest = persistence.read_manifest(path, cls.__name__, verify=verify)
+        attributes = manifest["attributes"]
+        agent = cls(
+            n_actions=attributes["n_actions"],
+            max_states=attributes["max_states"],
+            seed=seed,
+            replay_capacity=attributes["replay_capacity"]
+        )
+        agent.learning_rate = attributes["learning_rate"]
+        agent.discount_factor = attributes["discount_factor"]
+        agent.epsilon = attributes["epsilon"]
+        agent.dropped_states = attributes["dropped_states"]
+
+        # Copied into the writable, preallocated tables rather than memory-mapped
+        q_table = persistence.load_array(path, manifest, "q_table", mmap_mode=None)
+        keys = persistence.load_array(path, manifest, "state_keys", mmap_mode=None)
+        agent.q_table[:len(q_table)] = q_table
+        agent.state_index = dict(zip(keys.tolist(), range(len(keys))))
+        agent.replay.add(*(
+            persistence.load_array(path, manifest, f"replay.{name}", mmap_mode=None)
+            for name in ReplayBuffer.FIELDS
+        ))
+        return agent
+
     def decide_loan_approval(self, features):
         """Decide loan approval using Reinforcement Learning"""
-        state = self.get_state(features)
-        action = self.choose_action(state)
-        
+        return self.decide_loan_approval_batch(np.atleast_2d(features), as_records=True)[0]
+
+    def decide_loan_approval_batch(self, features, as_records=False):
+        """Epsilon-greedy decisions for every row of a feature matrix in one pass"""
+        rows = self._rows(self.get_states(features))
+        q_values = self._q_values(rows)
+
+        explore = self.rng.random(len(rows)) < self.epsilon
+        action = np.where(explore, self.rng.integers(self.n_actions, size=len(rows)), q_values.argmax(axis=1))
+        # States never learned from have no Q-value to report
+        confidence = np.where(rows >= 0, q_values[np.arange(len(rows)), action], 0.5).astype(np.float64)
+
+        decision = np.where(action == 1, 'approve', 'reject')
+        if as_records:
+            return [
+                {'decision': d, 'action': a, 'confidence': c}
+                for d, a, c in zip(decision.tolist(), action.tolist(), confidence.tolist())
+            ]
+        return {'decision': decision, 'action': action, 'confidence': confidence}
+
+    def memory_footprint(self):
+        """Approximate resident bytes of the Q-table and index, and the cost per million states"""
+        n_states = len(self.state_index)
+        row_bytes = self.q_table.itemsize * self.n_actions
+        # Dict slot (hash, key, value pointers plus sparse index) and the int key/value objects
+        index_bytes = sys.getsizeof(self.state_index) + n_states * 2 * 32
+        per_state = row_bytes + (index_bytes / n_states if n_states else 0.0)
         return {
-            'decision': 'approve' if action == 1 else 'reject',
-            'action': int(action),
-            'confidence': float(self.q_table.get(state, [0, 0])[action]) if state in self.q_table else 0.5
+            "states": n_states,
+            "max_states": self.max_states,
+            "dropped_states": self.dropped_states,
+            "q_table_bytes": n_states * row_bytes,
+            "q_table_reserved_bytes": self.q_table.nbytes,
+            "index_bytes": index_bytes,
+            "bytes_per_state": per_state,
+            "bytes_per_million_states": per_state * 1_000_000
         }
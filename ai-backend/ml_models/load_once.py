@@ -0,0 +1,36 @@
+"""
+Load-Once Cache
+Objects that are expensive to build (models, tokenizers) are built at most
+once per key. Each key loads under its own lock, so threads asking for the
+same object wait for one load while other keys load concurrently.
+"""
+
+import threading
+import time
+
+class LoadOnceCache:
+    """Thread-safe cache that calls each key's loader at most once"""
+
+    def __init__(self):
+        self.objects = {}
+        self.load_times = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        """Return the object cached under `key`, calling loader() on first use"""
+        obj = self.objects.get(key)
+        if obj is not None:
+            return obj
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            if key in self.objects:
+                return self.objects[key]
+            start = time.perf_counter()
+            obj = loader()
+            self.load_times[key] = time.perf_counter() - start
+            self.objects[key] = obj
+            return obj
@@ -3,29 +3,74 @@ Natural Language Processing Module
 Uses: BERT, Hugging Face Transformers, spaCy
 """
 
-from transformers import BertTokenizer, BertForSequenceClassification
+import os
+
 import torch
 import spacy
 
+from .quantization import should_quantize
+from .transformer_runtime import nlp_bert_model, runtime
+
+# spaCy components that named-entity recognition does not use; only doc.ents is read
+NON_NER_COMPONENTS = ['tagger', 'morphologizer', 'parser', 'senter', 'attribute_ruler', 'lemmatizer']
+
+def load_ner_pipeline(name='en_core_web_sm'):
+    nlp = spacy.load(name, exclude=NON_NER_COMPONENTS)
+    # The shared tok2vec only feeds the excluded tagger/parser in small models
+    if 'tok2vec' in nlp.pipe_names and not nlp.get_pipe('tok2vec').listening_components:
+        nlp.remove_pipe('tok2vec')
+    return nlp
+
 class NLPProcessor:
-    def __init__(self):
-        # Load BERT model from Hugging Face Transformers
-        self.bert_tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-        self.bert_model = BertForSequenceClassification.from_pretrained('bert-base-uncased')
+    def __init__(self, num_threads=None, quantize=None):
+        # Intra-op threads for CPU inference (torch default: one per core)
+        num_threads = num_threads or int(os.environ.get('NLP_NUM_THREADS', 0))
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        # BERT-family model from Hugging Face Transformers (Rust-backed fast tokenizer), loaded
+        # once per process by the shared runtime and, by default, the same copy ClaimAnalysisModel
+        # uses; eval mode, optionally int8 (QUANTIZE_MODELS=nlp)
+        self.model_name = nlp_bert_model()
+        self.quantized = should_quantize('nlp') if quantize is None else quantize
+        self.bert_tokenizer = runtime.tokenizer(self.model_name)
+        self.bert_model = runtime.model(self.model_name, quantize=self.quantized)
         
-        # Load spaCy for Natural Language Processing
+        # Load spaCy for Natural Language Processing, pruned to what NER needs
         try:
-            self.nlp = spacy.load('en_core_web_sm')
+            self.nlp = runtime.get(('spacy', 'en_core_web_sm'), load_ner_pipeline)
         except:
             print("spaCy model not found. Run: python -m spacy download en_core_web_sm")
             self.nlp = None
     
     def analyze_sentiment(self, text):
         """Analyze business description sentiment using BERT"""
-        inputs = self.bert_tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-        outputs = self.bert_model(**inputs)
-        predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
-        return predictions.tolist()
+        return self.analyze_sentiment_batch([text], batch_size=1)
+    
+    def analyze_sentiment_batch(self, texts, batch_size=32, max_length=512):
+        """
+        Sentiment probabilities for many texts, in input order.
+        Texts are sorted by length and each batch is tokenized and padded only
+        to its longest text, then run under torch.inference_mode().
+        """
+        texts = list(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+
+        results = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            batch_order = order[start:start + batch_size]
+            # The model and tokenizer may be shared with other threads through the runtime;
+            # holding the lock per batch lets their requests run between our batches
+            with runtime.lock(self.model_name), torch.inference_mode():
+                batch = self.bert_tokenizer(
+                    [texts[i] for i in batch_order],
+                    padding=True, truncation=True, max_length=max_length, return_tensors="pt"
+                )
+                outputs = self.bert_model(**batch)
+            predictions = torch.nn.functional.softmax(outputs.logits, dim=-1).tolist()
+            for i, prediction in zip(batch_order, predictions):
+                results[i] = prediction
+        return results
     
     def extract_entities(self, text):
         """Extract business entities using spaCy NLP"""
@@ -35,6 +80,26 @@ class NLPProcessor:
             return entities
         return []
     
+    def extract_entities_bulk(self, texts, batch_size=256, n_process=1, as_tuples=False):
+        """
+        Yield the entities of each text in order, streaming through nlp.pipe.
+        With as_tuples=True, texts are (text, context) pairs and (entities, context)
+        pairs are yielded, e.g. to carry application ids. n_process > 1 spreads
+        batches over worker processes; memory stays bounded by the batch size.
+        """
+        if not self.nlp:
+            for item in texts:
+                yield ([], item[1]) if as_tuples else []
+            return
+
+        docs = self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process, as_tuples=as_tuples)
+        if as_tuples:
+            for doc, context in docs:
+                yield [(ent.text, ent.label_) for ent in doc.ents], context
+        else:
+            for doc in docs:
+                yield [(ent.text, ent.label_) for ent in doc.ents]
+    
     def process_grant_application(self, application_text):
         """Natural Language Processing for grant applications"""
         sentiment = self.analyze_sentiment(application_text)
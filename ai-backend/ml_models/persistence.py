@@ -0,0 +1,104 @@
+"""
+Model Persistence
+Saves trained models to a directory of uncompressed joblib and .npy files
+with a manifest.json of format version, library versions and sha256
+checksums. Loading memory-maps the large arrays read-only, so worker
+processes on one host share a single copy through the page cache.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import sklearn
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+
+class ModelFormatError(ValueError):
+    """Raised when a saved model is missing, corrupt or from another format version"""
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _replace(directory, filename, write):
+    # Write a new file and rename it into place: processes that still have the
+    # old file memory-mapped keep reading the old inode instead of a truncated one
+    path = os.path.join(directory, filename)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+    return filename
+
+def dump_object(directory, name, obj):
+    """joblib-dump obj uncompressed, so its arrays can be memory-mapped on load"""
+    return _replace(directory, f"{name}.joblib", lambda f: joblib.dump(obj, f, compress=0))
+
+def dump_array(directory, name, array):
+    return _replace(
+        directory, f"{name}.npy",
+        lambda f: np.save(f, np.ascontiguousarray(array), allow_pickle=False)
+    )
+
+def write_manifest(directory, kind, files, attributes=None):
+    """Write manifest.json last, so a directory without one is an incomplete save"""
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "kind": kind,
+        "created_at": time.time(),
+        "sklearn_version": sklearn.__version__,
+        "numpy_version": np.__version__,
+        "files": {
+            name: {"file": filename, "sha256": file_sha256(os.path.join(directory, filename))}
+            for name, filename in files.items()
+        },
+        "attributes": attributes or {}
+    }
+    _replace(directory, MANIFEST, lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+    return manifest
+
+def read_manifest(directory, kind, verify=True):
+    """Read and check a manifest; with verify=True every file's checksum is compared"""
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        raise ModelFormatError(f"No {MANIFEST} in {directory}")
+    with open(path) as f:
+        manifest = json.load(f)
+
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ModelFormatError(
+            f"Unsupported format version {manifest.get('format_version')} (expected {FORMAT_VERSION})"
+        )
+    if manifest.get("kind") != kind:
+        raise ModelFormatError(f"{directory} holds a {manifest.get('kind')}, not a {kind}")
+    if manifest.get("sklearn_version") != sklearn.__version__:
+        print(f"Warning: {directory} was saved with scikit-learn {manifest.get('sklearn_version')}, "
+              f"running {sklearn.__version__}")
+
+    if verify:
+        for name, entry in manifest["files"].items():
+            file_path = os.path.join(directory, entry["file"])
+            if not os.path.exists(file_path):
+                raise ModelFormatError(f"Missing file for {name}: {entry['file']}")
+            if file_sha256(file_path) != entry["sha256"]:
+                raise ModelFormatError(f"Checksum mismatch for {name}: {entry['file']}")
+    return manifest
+
+def load_object(directory, manifest, name, mmap_mode='r'):
+    return joblib.load(os.path.join(directory, manifest["files"][name]["file"]), mmap_mode=mmap_mode)
+
+def load_array(directory, manifest, name, mmap_mode='r'):
+    return np.load(
+        os.path.join(directory, manifest["files"][name]["file"]),
+        mmap_mode=mmap_mode,
+        allow_pickle=False
+    )
@@ -0,0 +1,23 @@
+"""
+Worker Process Pools
+Process pools for the CPU-bound model code in this package. Workers are
+spawned, never forked: forking after OpenMP/BLAS threads have started can
+deadlock the child.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+def spawn_pool(max_workers, initializer=None, initargs=()):
+    """ProcessPoolExecutor whose workers start from a fresh interpreter"""
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=initializer,
+        initargs=initargs
+    )
+
+def threads_per_worker(workers):
+    """Threads each of `workers` concurrent processes can use without oversubscribing the cores"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
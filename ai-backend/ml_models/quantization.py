@@ -0,0 +1,45 @@
+"""
+Int8 Dynamic Quantization for CPU Inference
+Linear layers of transformer models are converted to int8 weights with
+activations quantized on the fly, which shrinks them roughly 4x and speeds
+up CPU matrix multiplies. Opt-in per model through QUANTIZE_MODELS, a
+comma-separated list of model names ("claim", "nlp"), "all" or "none"
+(default).
+"""
+
+import io
+import os
+
+QUANTIZABLE_MODELS = ('claim', 'nlp')
+
+def quantized_models(env_var='QUANTIZE_MODELS'):
+    """Model names configured for int8 inference"""
+    value = os.environ.get(env_var, 'none').strip().lower()
+    if value in ('', 'none'):
+        return set()
+    if value == 'all':
+        return set(QUANTIZABLE_MODELS)
+
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = names - set(QUANTIZABLE_MODELS)
+    if unknown:
+        raise ValueError(f"{env_var} contains unknown models: {', '.join(sorted(unknown))}")
+    return names
+
+def should_quantize(name, env_var='QUANTIZE_MODELS'):
+    return name in quantized_models(env_var)
+
+def quantize_dynamic_int8(model):
+    """Return an eval-mode copy of a torch model with int8 dynamic quantization of nn.Linear"""
+    import torch
+
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def model_size_bytes(model):
+    """Serialized size of the model's state dict"""
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
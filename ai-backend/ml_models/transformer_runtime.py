@@ -0,0 +1,122 @@
+"""
+Shared Transformer Runtime
+Process-wide cache of transformer models, tokenizers and pipelines (and the
+spaCy pipeline), so each is loaded once per process however many components
+use it. Models are keyed by checkpoint name and precision only: components
+that name the same checkpoint share one copy of its weights. Per-model locks
+serialize inference, since fast tokenizers cannot be used from several
+threads at once.
+
+For forked workers, load models in the parent and call prepare_for_fork()
+before forking: gc.freeze() keeps the collector from writing to the loaded
+objects, so their pages (and the weights) stay shared copy-on-write.
+
+Configuration (environment variables):
+    CLAIM_SENTIMENT_MODEL   ClaimAnalysisModel's sentiment model
+                            (default: distilbert-base-uncased-finetuned-sst-2-english)
+    NLP_BERT_MODEL          NLPProcessor's sentiment model (default: the claim
+                            sentiment model, so both share one copy)
+"""
+
+import gc
+import os
+import threading
+
+from .load_once import LoadOnceCache
+from .quantization import quantize_dynamic_int8
+
+DEFAULT_SENTIMENT_MODEL = 'distilbert-base-uncased-finetuned-sst-2-english'
+
+def claim_sentiment_model():
+    return os.environ.get('CLAIM_SENTIMENT_MODEL', DEFAULT_SENTIMENT_MODEL)
+
+def nlp_bert_model():
+    return os.environ.get('NLP_BERT_MODEL') or claim_sentiment_model()
+
+
+class TransformerRuntime:
+    """Load-once cache of models and tokenizers with per-model locks"""
+
+    def __init__(self):
+        self._cache = LoadOnceCache()
+        self._objects = self._cache.objects
+        self.load_times = self._cache.load_times
+        self._use_locks = {}
+        self._lock = threading.Lock()
+        self.frozen = False
+
+    def get(self, key, loader):
+        """Return the object cached under `key`, calling loader() on first use"""
+        return self._cache.get(key, loader)
+
+    def tokenizer(self, name):
+        """Fast (Rust-backed) tokenizer for a model name"""
+        def load():
+            from transformers import AutoTokenizer
+            return AutoTokenizer.from_pretrained(name, use_fast=True)
+        return self.get(('tokenizer', name), load)
+
+    def model(self, name, quantize=False):
+        """Eval-mode sequence classification model, optionally int8-quantized"""
+        def load():
+            from transformers import AutoModelForSequenceClassification
+            model = AutoModelForSequenceClassification.from_pretrained(name)
+            model.eval()
+            return quantize_dynamic_int8(model) if quantize else model
+        return self.get(('model', name, quantize), load)
+
+    def pipeline(self, task, name, quantize=False):
+        """transformers pipeline built on the shared model and tokenizer"""
+        def load():
+            from transformers import pipeline
+            return pipeline(task, model=self.model(name, quantize=quantize), tokenizer=self.tokenizer(name))
+        return self.get(('pipeline', task, name, quantize), load)
+
+    def lock(self, name):
+        """Lock serializing inference on one model and its tokenizer"""
+        with self._lock:
+            return self._use_locks.setdefault(name, threading.RLock())
+
+    def loaded(self):
+        return [' '.join(str(part) for part in key) for key in self._objects]
+
+    def prepare_for_fork(self):
+        """
+        Freeze everything loaded so far into the collector's permanent generation.
+        Call after loading and before forking; do not run inference first, as
+        forking after torch's thread pools have started can hang the children.
+        """
+        gc.collect()
+        gc.freeze()
+        self.frozen = True
+        return {"frozen_objects": gc.get_freeze_count(), "loaded": self.loaded()}
+
+    def stats(self):
+        return {
+            "loaded": self.loaded(),
+            "load_seconds": {' '.join(str(p) for p in key): t for key, t in self.load_times.items()},
+            "frozen": self.frozen
+        }
+
+
+def memory_report(pid='self'):
+    """
+    Resident memory of a process in MB (Linux). RSS counts shared pages in
+    full; PSS splits them between the processes sharing them and USS counts
+    private pages only, so PSS/USS show what copy-on-write sharing saves.
+    """
+    report = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line and not line.startswith(' '))
+        kb = {key: int(value.split()[0]) for key, value in fields.items() if value.strip().endswith('kB')}
+        report['rss_mb'] = kb.get('Rss', 0) / 1024
+        report['pss_mb'] = kb.get('Pss', 0) / 1024
+        report['uss_mb'] = (kb.get('Private_Clean', 0) + kb.get('Private_Dirty', 0)) / 1024
+    except OSError:
+        import resource
+        report['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return report
+
+
+runtime = TransformerRuntime()
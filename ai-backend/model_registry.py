@@ -0,0 +1,111 @@
+"""
+Lazy Model Registry
+Defers heavy library imports and model construction until first use or a
+background warm-up, so the API can start serving cheap endpoints at once.
+"""
+
+import os
+import threading
+
+from ml_models.load_once import LoadOnceCache
+
+class ModelRegistry:
+    """Thread-safe registry of lazily constructed models"""
+
+    def __init__(self):
+        self._factories = {}
+        self._cache = LoadOnceCache()
+        self._models = self._cache.objects
+        self._load_times = self._cache.load_times
+        self._errors = {}
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+
+    def register(self, name, factory):
+        """Register a zero-argument factory that builds the model"""
+        with self._lock:
+            self._factories[name] = factory
+
+    @property
+    def names(self):
+        return list(self._factories)
+
+    def get(self, name):
+        """Return the model, loading it on first use"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._factories:
+            raise KeyError(f"Unknown model: {name}")
+
+        try:
+            model = self._cache.get(name, self._factories[name])
+        except Exception as e:
+            self._errors[name] = str(e)
+            raise
+        self._errors.pop(name, None)
+        return model
+
+    def get_if_loaded(self, name):
+        """Return the model only if it is already loaded (never triggers a load)"""
+        return self._models.get(name)
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def preload(self, names=None, background=False):
+        """Load the given models (all registered models by default)"""
+        names = self.names if names is None else list(names)
+
+        def _load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Failed to load model '{name}': {e}")
+
+        if not background:
+            _load_all()
+            return None
+
+        self._warmup_thread = threading.Thread(
+            target=_load_all, name="model-warmup", daemon=True
+        )
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    def is_ready(self, names=None):
+        """True once every requested model has loaded"""
+        names = self.names if names is None else names
+        return all(name in self._models for name in names)
+
+    def status(self):
+        """Load state, load time and last error for every registered model"""
+        return {
+            name: {
+                "loaded": name in self._models,
+                "load_seconds": self._load_times.get(name),
+                "error": self._errors.get(name)
+            }
+            for name in self._factories
+        }
+
+
+def configured_models(registry, env_var='PRELOAD_MODELS'):
+    """
+    Models this deployment is configured to serve.
+    PRELOAD_MODELS is a comma-separated list of model names,
+    "all" (default) or "none" for purely on-demand loading.
+    """
+    value = os.environ.get(env_var, 'all').strip().lower()
+    if value in ('', 'all'):
+        return registry.names
+    if value == 'none':
+        return []
+
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in registry.names]
+    if unknown:
+        raise ValueError(f"{env_var} contains unknown models: {', '.join(unknown)}")
+    return names
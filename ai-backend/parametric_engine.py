@@ -0,0 +1,180 @@
+"""
+Bulk Parametric Trigger Engine
+Keeps active parametric policies indexed per (trigger_type, region) and sorted
+by threshold, so one oracle reading finds every newly triggered policy with a
+binary search instead of a scan.
+
+The index lives in process memory: run a single serving process (or shard
+policies by region across processes) so every reading sees every policy.
+"""
+
+import math
+import numbers
+import threading
+from bisect import bisect_left, bisect_right
+
+DEFAULT_REGION = 'global'
+
+class ParametricTriggerEngine:
+    """In-memory index of active parametric policies"""
+
+    def __init__(self, data_source="Chainlink Oracle"):
+        self.data_source = data_source
+        # (trigger_type, region) -> (sorted thresholds, policies in the same order)
+        self._index = {}
+        # policy_id -> ((trigger_type, region), threshold) for replacement and removal
+        self._policy_keys = {}
+        self._lock = threading.Lock()
+
+        self.readings_processed = 0
+        self.policies_triggered = 0
+        self.total_payout = 0
+
+    @staticmethod
+    def _key(trigger_type, region):
+        return (trigger_type or 'weather', region or DEFAULT_REGION)
+
+    @staticmethod
+    def _number(value, field):
+        """float(value), raising ValueError for missing, non-numeric or NaN values"""
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} must be a number, got {value!r}") from None
+        if math.isnan(number):
+            raise ValueError(f"{field} must not be NaN")
+        return number
+
+    def _entry(self, policy):
+        """Validated index entry for one policy"""
+        if not isinstance(policy, dict) or policy.get('policy_id') is None or policy.get('threshold') is None:
+            raise ValueError("Each policy needs a policy_id and a threshold")
+        coverage = policy.get('coverage', 0)
+        if not isinstance(coverage, numbers.Real) or isinstance(coverage, bool):
+            raise ValueError(f"coverage must be a number, got {coverage!r}")
+
+        key = self._key(policy.get('trigger_type'), policy.get('region'))
+        return key, {
+            "policy_id": policy['policy_id'],
+            "trigger_type": key[0],
+            "region": key[1],
+            "threshold": self._number(policy['threshold'], 'threshold'),
+            "coverage": coverage
+        }
+
+    def add_policies(self, policies):
+        """
+        Register (or replace) active policies.
+        Each policy: {"policy_id", "trigger_type", "threshold", "coverage", "region"?}
+        Every policy is validated before the index changes, so a bad entry
+        raises ValueError and registers (or replaces) nothing.
+        """
+        validated = [self._entry(policy) for policy in policies]
+
+        with self._lock:
+            for key, entry in validated:
+                self._remove(entry['policy_id'])
+                thresholds, entries = self._index.setdefault(key, ([], []))
+                i = bisect_right(thresholds, entry['threshold'])
+                thresholds.insert(i, entry['threshold'])
+                entries.insert(i, entry)
+                self._policy_keys[entry['policy_id']] = (key, entry['threshold'])
+        return len(validated)
+
+    def remove_policy(self, policy_id):
+        """Deactivate a policy; returns True if it was active"""
+        with self._lock:
+            return self._remove(policy_id)
+
+    def _remove(self, policy_id):
+        location = self._policy_keys.pop(policy_id, None)
+        if location is None:
+            return False
+
+        key, threshold = location
+        thresholds, entries = self._index[key]
+        # Binary search to the threshold, then scan only policies sharing it
+        i = bisect_left(thresholds, threshold)
+        while i < len(thresholds) and thresholds[i] == threshold:
+            if entries[i]['policy_id'] == policy_id:
+                del thresholds[i]
+                del entries[i]
+                return True
+            i += 1
+        return False
+
+    def evaluate(self, trigger_type, current_value, region=None):
+        """
+        Apply one oracle reading. Every active policy with threshold <= value
+        triggers, is removed from the index and returned as a payout.
+        """
+        current_value = self._number(current_value, 'current_value')
+        key = self._key(trigger_type, region)
+        with self._lock:
+            self.readings_processed += 1
+            if key not in self._index:
+                return []
+
+            thresholds, entries = self._index[key]
+            hi = bisect_right(thresholds, current_value)
+            if hi == 0:
+                return []
+
+            triggered = entries[:hi]
+            del thresholds[:hi]
+            del entries[:hi]
+            for entry in triggered:
+                del self._policy_keys[entry['policy_id']]
+
+            payouts = [
+                {
+                    "policy_id": entry['policy_id'],
+                    "trigger_type": entry['trigger_type'],
+                    "region": entry['region'],
+                    "triggered": True,
+                    "current_value": current_value,
+                    "threshold": entry['threshold'],
+                    "payout_amount": entry['coverage'],
+                    "data_source": self.data_source
+                }
+                for entry in triggered
+            ]
+            self.policies_triggered += len(payouts)
+            self.total_payout += sum(p['payout_amount'] for p in payouts)
+            return payouts
+
+    def evaluate_readings(self, readings):
+        """
+        Apply a batch of readings for many regions and trigger types.
+        Each reading: {"trigger_type", "current_value", "region"?}
+        Every reading is validated first, so a bad one raises ValueError
+        before any policy is triggered. Returns the payouts in reading order.
+        """
+        validated = []
+        for reading in readings:
+            if not isinstance(reading, dict):
+                raise ValueError("Each reading must be an object")
+            validated.append((
+                reading.get('trigger_type'),
+                self._number(reading.get('current_value'), 'current_value'),
+                reading.get('region')
+            ))
+
+        payouts = []
+        for trigger_type, current_value, region in validated:
+            payouts.extend(self.evaluate(trigger_type, current_value, region))
+        return payouts
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active_policies": len(self._policy_keys),
+                "indexes": {
+                    f"{trigger_type}:{region}": len(thresholds)
+                    for (trigger_type, region), (thresholds, _) in self._index.items()
+                    if thresholds
+                },
+                "readings_processed": self.readings_processed,
+                "policies_triggered": self.policies_triggered,
+                "total_payout": self.total_payout
+            }
@@ -0,0 +1,18 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from ml_models.compiled_forest import CompiledForest
+
+
+def test_matches_sklearn_predictions():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 6))
+    y = (X[:, 0] + X[:, 1] ** 2 > 1).astype(int)
+    forest = RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+    compiled = CompiledForest.from_sklearn(forest)
+
+    # Rows the forest never saw, including single-row requests
+    X_new = rng.normal(size=(200, 6))
+    np.testing.assert_allclose(compiled.predict_proba(X_new), forest.predict_proba(X_new), atol=1e-12)
+    np.testing.assert_allclose(compiled.predict_proba(X_new[:1]), forest.predict_proba(X_new[:1]), atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(X_new), forest.predict(X_new))
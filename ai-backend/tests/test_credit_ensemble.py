@@ -0,0 +1,123 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from ml_models import persistence
+from ml_models.ensemble_models import CreditScoringEnsemble
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 5))
+    return X, (X[:, 0] > 0).astype(int)
+
+
+def test_reference_accuracy_is_measured_on_held_out_rows(data):
+    X, y = data
+    ensemble = CreditScoringEnsemble(n_jobs=1)
+    ensemble.train(X, y, parallel=False)
+
+    assert ensemble.reference['accuracy'] is not None
+    # Flipped labels on a fresh batch are a large accuracy drop against that reference
+    report = ensemble.drift_report(X[:100], 1 - y[:100])
+    assert report['needs_full_retrain']
+
+
+def test_string_labels(data):
+    X, y = data
+    labels = np.where(y == 1, 'good', 'bad')
+    ensemble = CreditScoringEnsemble(n_jobs=1)
+    ensemble.train(X, labels, parallel=False)
+
+    report = ensemble.update(X[:50], labels[:50])['drift']
+    assert report['positive_rate'] == np.mean(labels[:50] == 'good')
+    assert 0.0 <= report['accuracy'] <= 1.0
+
+
+@pytest.fixture(scope='module')
+def trained(data):
+    X, y = data
+    ensemble = CreditScoringEnsemble(n_jobs=1)
+    ensemble.train(X, y, parallel=False)
+    ensemble.compile_forest(X_check=X[:50])
+    return ensemble
+
+
+def saved(ensemble, path):
+    assert ensemble.save(str(path))['saved']
+    return str(path)
+
+
+def test_save_load_round_trip(trained, data, tmp_path):
+    X, _ = data
+    loaded = CreditScoringEnsemble.load(saved(trained, tmp_path))
+
+    np.testing.assert_allclose(
+        loaded.predict_credit_score_batch(X)['probability'],
+        trained.predict_credit_score_batch(X)['probability']
+    )
+    np.testing.assert_array_equal(
+        loaded.detect_fraud_batch(X)['is_fraud'], trained.detect_fraud_batch(X)['is_fraud']
+    )
+    assert loaded.reference['accuracy'] == trained.reference['accuracy']
+
+
+def test_load_compiled_forest_only(trained, data, tmp_path):
+    X, _ = data
+    loaded = CreditScoringEnsemble.load(saved(trained, tmp_path), forest='compiled')
+
+    assert loaded.compiled_only
+    assert not hasattr(loaded.random_forest, 'estimators_')
+    # Every batch size is scored by the compiled forest, which matches sklearn's
+    np.testing.assert_allclose(
+        loaded.predict_credit_score_batch(X)['probability'],
+        trained.predict_credit_score_batch(X)['probability']
+    )
+    assert 'error' in loaded.save(str(tmp_path / 'again'))
+
+
+def test_load_compiled_needs_compiled_forest(data, tmp_path):
+    X, y = data
+    ensemble = CreditScoringEnsemble(n_jobs=1)
+    ensemble.train(X, y, parallel=False)
+
+    with pytest.raises(persistence.ModelFormatError):
+        CreditScoringEnsemble.load(saved(ensemble, tmp_path), forest='compiled')
+
+
+def test_corrupted_file_is_rejected(trained, tmp_path):
+    path = saved(trained, tmp_path)
+    with open(os.path.join(path, 'kmeans.joblib'), 'r+b') as f:
+        f.seek(100)
+        byte = f.read(1)
+        f.seek(100)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    with pytest.raises(persistence.ModelFormatError, match='Checksum'):
+        CreditScoringEnsemble.load(path)
+
+
+def test_missing_file_is_rejected(trained, tmp_path):
+    path = saved(trained, tmp_path)
+    os.remove(os.path.join(path, 'neural_network.joblib'))
+
+    with pytest.raises(persistence.ModelFormatError, match='Missing'):
+        CreditScoringEnsemble.load(path)
+    with pytest.raises(persistence.ModelFormatError):
+        CreditScoringEnsemble.load(str(tmp_path / 'nothing-here'))
+
+
+def test_other_format_version_is_rejected(trained, tmp_path):
+    path = saved(trained, tmp_path)
+    manifest_path = os.path.join(path, persistence.MANIFEST)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest['format_version'] = persistence.FORMAT_VERSION + 1
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+
+    with pytest.raises(persistence.ModelFormatError, match='format version'):
+        CreditScoringEnsemble.load(path)
@@ -0,0 +1,76 @@
+import io
+import zipfile
+
+import numpy as np
+import pytest
+
+from federated import StreamingFedAvg, encode_update
+
+
+def update(**layers):
+    return io.BytesIO(encode_update(layers))
+
+
+def test_rejected_update_leaves_round_unchanged():
+    aggregator = StreamingFedAvg()
+    aggregator.start_round('r1')
+    ones = {"a": np.ones(3), "b": np.ones(2)}
+
+    aggregator.submit('node0', update(**ones), 10)
+    with pytest.raises(ValueError):
+        aggregator.submit('node1', update(a=np.full(3, 5.0), b=np.array(['x', 'y'])), 10)
+    status = aggregator.submit('node2', update(**ones), 10)
+    aggregator.close_round('r1')
+
+    assert status["nodes_participated"] == 2
+    assert status["total_samples"] == 20
+    np.testing.assert_allclose(aggregator.global_model["a"], 1.0)
+    np.testing.assert_allclose(aggregator.global_model["b"], 1.0)
+
+
+def test_corrupt_archive_is_rejected_without_folding():
+    aggregator = StreamingFedAvg()
+    aggregator.start_round('r1')
+    aggregator.submit('node0', update(a=np.ones(1000), b=np.ones(1000)), 10)
+
+    # Valid headers, corrupted data in the last layer: fails only after the first layer decodes
+    raw = bytearray(encode_update({"a": np.full(1000, 5.0), "b": np.full(1000, 5.0)}))
+    with zipfile.ZipFile(io.BytesIO(bytes(raw))) as archive:
+        info = archive.getinfo('b.npy')
+    data_start = info.header_offset + 30 + len(info.filename) + len(info.extra)
+    raw[data_start + info.file_size - 8] ^= 0xFF
+    with pytest.raises(ValueError):
+        aggregator.submit('node1', io.BytesIO(bytes(raw)), 10)
+
+    aggregator.close_round('r1')
+    np.testing.assert_allclose(aggregator.global_model["a"], 1.0)
+    np.testing.assert_allclose(aggregator.global_model["b"], 1.0)
+
+
+def test_weighted_mean():
+    aggregator = StreamingFedAvg()
+    aggregator.start_round('r1', expected_nodes=3)
+    for node, (value, samples) in enumerate([(1.0, 10), (4.0, 20), (-2.0, 30)]):
+        aggregator.submit(f'node{node}', update(w=np.full((2, 2), value, dtype=np.float32)), samples)
+
+    expected = (1.0 * 10 + 4.0 * 20 - 2.0 * 30) / 60
+    np.testing.assert_allclose(aggregator.global_model["w"], expected, rtol=1e-6)
+    assert aggregator.model_version == 1
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'round_id': 'r1'},
+    {'expected_nodes': 'ten'},
+    {'timeout_seconds': -5},
+    {'min_nodes': 2.5},
+    {'expected_nodes': 2, 'min_nodes': 3},
+])
+def test_rejected_start_round_keeps_open_round(kwargs):
+    aggregator = StreamingFedAvg()
+    aggregator.start_round('r1')
+
+    with pytest.raises(ValueError):
+        aggregator.start_round(**kwargs)
+
+    assert aggregator.current_round_id == 'r1'
+    assert aggregator.round_status('r1')['state'] == 'open'
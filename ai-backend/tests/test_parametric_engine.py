@@ -0,0 +1,52 @@
+import pytest
+
+from parametric_engine import ParametricTriggerEngine
+
+
+def engine_with_policies():
+    engine = ParametricTriggerEngine()
+    engine.add_policies([
+        {"policy_id": 1, "trigger_type": "rainfall", "region": "lagos", "threshold": 100, "coverage": 500},
+        {"policy_id": 2, "trigger_type": "rainfall", "region": "lagos", "threshold": 150, "coverage": 700},
+        {"policy_id": 3, "trigger_type": "wind", "region": "accra", "threshold": 80, "coverage": 900},
+    ])
+    return engine
+
+
+def test_bad_reading_triggers_nothing():
+    engine = engine_with_policies()
+    readings = [
+        {"trigger_type": "rainfall", "region": "lagos", "current_value": 120},
+        {"trigger_type": "wind", "region": "accra", "current_value": "strong"},
+    ]
+    with pytest.raises(ValueError):
+        engine.evaluate_readings(readings)
+    assert engine.stats()["active_policies"] == 3
+
+    payouts = engine.evaluate_readings([
+        {"trigger_type": "rainfall", "region": "lagos", "current_value": "120"},
+        {"trigger_type": "wind", "region": "accra", "current_value": 95},
+    ])
+    assert [p["policy_id"] for p in payouts] == [1, 3]
+    assert engine.stats()["active_policies"] == 1
+
+
+def test_bad_replacement_keeps_live_policies():
+    engine = engine_with_policies()
+    with pytest.raises(ValueError):
+        engine.add_policies([
+            {"policy_id": 4, "trigger_type": "wind", "region": "accra", "threshold": 60},
+            {"policy_id": 1, "trigger_type": "rainfall", "region": "lagos", "threshold": "high"},
+        ])
+    assert engine.stats()["active_policies"] == 3
+
+    payouts = engine.evaluate("rainfall", 100, region="lagos")
+    assert [p["policy_id"] for p in payouts] == [1]
+    assert engine.evaluate("wind", 70, region="accra") == []
+
+
+def test_nan_reading_is_rejected():
+    engine = engine_with_policies()
+    with pytest.raises(ValueError):
+        engine.evaluate("rainfall", float("nan"), region="lagos")
+    assert engine.stats()["active_policies"] == 3
@@ -0,0 +1,41 @@
+import numpy as np
+
+from ml_models.ensemble_models import ReinforcementLearningAgent
+
+
+def test_repeated_transition_converges_to_reward():
+    agent = ReinforcementLearningAgent(max_states=16, seed=0)
+    features = np.ones((10, 3))
+    # Terminal-like transition: next state has never been seen, so its Q-values stay 0
+    agent.remember(features, np.zeros(10, dtype=int), np.ones(10), np.full((10, 3), 7.0))
+    agent.discount_factor = 0.0
+
+    history = []
+    for _ in range(200):
+        agent.learn_batch(256)
+        history.append(float(agent.q_table[agent.state_index[agent.get_state(features[0])], 0]))
+
+    assert all(0.0 < q <= 1.0 for q in history)
+    assert np.isclose(history[-1], 1.0, atol=1e-3)
+
+
+def test_batch_update_matches_single_update_for_distinct_pairs():
+    batched = ReinforcementLearningAgent(max_states=64, seed=0)
+    single = ReinforcementLearningAgent(max_states=64, seed=0)
+    features = np.arange(12, dtype=float).reshape(4, 3)
+    next_features = features + 100
+    actions = np.array([0, 1, 0, 1])
+    rewards = np.array([1.0, -1.0, 0.5, 2.0])
+
+    batched.remember(features, actions, rewards, next_features)
+    # Sample each transition exactly once
+    batched.replay.sample = lambda batch_size, rng: np.arange(4)
+    batched.learn_batch(4)
+
+    for row, action, reward, next_row in zip(features, actions, rewards, next_features):
+        single.learn(single.get_state(row), int(action), float(reward), single.get_state(next_row))
+
+    for row, action in zip(features, actions):
+        q_batched = batched.q_table[batched.state_index[batched.get_state(row)], action]
+        q_single = single.q_table[single.state_index[single.get_state(row)], action]
+        assert np.isclose(q_batched, q_single)
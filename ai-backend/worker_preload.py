@@ -0,0 +1,16 @@
+"""
+Model preload for forked inference workers
+Imported by the forkserver when the ASGI pool runs with
+INFERENCE_POOL_START_METHOD=forkserver. Models are loaded once here, and every
+worker forked afterwards shares their weights copy-on-write.
+"""
+
+import os
+
+os.environ['MODEL_WARMUP'] = 'off'
+import app as backend
+from ml_models.transformer_runtime import runtime
+
+backend.registry.preload(backend.served_models)
+# No inference has run yet, so forking is safe; keep the collector off the loaded objects
+runtime.prepare_for_fork()